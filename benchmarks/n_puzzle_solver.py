@@ -0,0 +1,83 @@
+"""Benchmark the optimal n-Puzzle solver on fixed seeds.
+
+Usage:
+    python benchmarks/n_puzzle_solver.py [--seeds 20] [--json results.json]
+
+The 8-puzzle boards are uniformly random solvable boards. The 15-puzzle boards
+are random walks of --walk-moves moves from the goal, since uniformly random
+15-puzzle boards can take minutes each for a pure Python IDA*.
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from visual_puzzle.n_puzzle import n_PuzzleEnv
+from visual_puzzle.solvers.n_puzzle import get_solver
+
+
+def run(n_puzzle, scramble, scramble_moves, seeds):
+    env = n_PuzzleEnv(
+        n_puzzle=n_puzzle, scramble=scramble, scramble_moves=scramble_moves
+    )
+
+    start = time.perf_counter()
+    solver = get_solver(env.size)
+    setup_time = time.perf_counter() - start
+
+    lengths, times = [], []
+    for seed in range(seeds):
+        env.reset(seed=seed)
+        start = time.perf_counter()
+        actions = solver.solve(env.board)
+        times.append(time.perf_counter() - start)
+        lengths.append(len(actions))
+
+        # The solution has to actually solve the environment
+        terminated = False
+        for action in actions:
+            _, _, terminated, _, _ = env.step(action)
+        assert terminated, f"Solution for seed {seed} does not solve the board."
+
+    return {
+        "n_puzzle": n_puzzle,
+        "scramble": scramble,
+        "seeds": seeds,
+        "setup_seconds": setup_time,
+        "mean_length": float(np.mean(lengths)),
+        "max_length": int(np.max(lengths)),
+        "mean_seconds": float(np.mean(times)),
+        "median_seconds": float(np.median(times)),
+        "max_seconds": float(np.max(times)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seeds", type=int, default=20)
+    parser.add_argument("--walk-moves", type=int, default=60)
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args()
+
+    results = [
+        run(8, "solvable", 0, args.seeds),
+        run(15, "random_walk", args.walk_moves, args.seeds),
+    ]
+    for result in results:
+        print(
+            f"{result['n_puzzle']:>3}-puzzle ({result['scramble']}): "
+            f"setup {result['setup_seconds']:.2f}s, "
+            f"mean length {result['mean_length']:.1f}, "
+            f"solve mean {result['mean_seconds'] * 1000:.1f}ms, "
+            f"median {result['median_seconds'] * 1000:.1f}ms, "
+            f"max {result['max_seconds'] * 1000:.1f}ms"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Benchmark the startup time of fresh worker processes.
+
+Usage:
+    python benchmarks/startup.py [--repeats 10] [--json results.json]
+        [--baseline baseline.json] [--tolerance 0.25]
+
+Each measurement runs a new Python process that imports visual_puzzle and
+creates one environment with gym.make, as a short-lived training worker would.
+The script fails if a GUI module (tkinter, matplotlib) was imported by a
+headless environment.
+
+With --baseline, the median import and gym.make times are compared with those
+of an earlier --json run, as in throughput.py, and the script fails if one is
+slower than the baseline by more than --tolerance (relative).
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+import numpy as np
+
+from throughput import compare
+
+# Runs in the child process and prints its measurements as JSON
+_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import visual_puzzle
+import_time = time.perf_counter() - start
+import gymnasium as gym
+start = time.perf_counter()
+env = gym.make({env_id!r}, **{kwargs!r})
+make_time = time.perf_counter() - start
+gui_modules = [m for m in ("tkinter", "matplotlib") if m in sys.modules]
+print(json.dumps([import_time, make_time, gui_modules]))
+"""
+
+# RushHour-v0 gets a board so the benchmark does not depend on rush.txt
+CASES = [
+    ("n_Puzzle-v0", {}),
+    ("jigsaw-v0", {}),
+    ("RushHour-v0", {"board_description": "ooIBBBGoIJCCGAAJKLoHDDKLxHFFKMoooooM"}),
+]
+
+# Metrics compared with the baseline, and whether higher values are better
+METRICS = {
+    "median_import_seconds": False,
+    "median_make_seconds": False,
+}
+
+
+def run(env_id, kwargs, repeats):
+    import_times, make_times, gui_modules = [], [], set()
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", _CHILD.format(env_id=env_id, kwargs=kwargs)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        import_time, make_time, modules = json.loads(output.splitlines()[-1])
+        import_times.append(import_time)
+        make_times.append(make_time)
+        gui_modules.update(modules)
+    return {
+        "name": env_id,
+        "repeats": repeats,
+        "median_import_seconds": float(np.median(import_times)),
+        "median_make_seconds": float(np.median(make_times)),
+        "gui_modules": sorted(gui_modules),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--json", help="Write the results to this file.")
+    parser.add_argument("--baseline", help="Compare with the results in this file.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Largest relative slowdown accepted by --baseline.",
+    )
+    args = parser.parse_args()
+
+    results = [run(env_id, kwargs, args.repeats) for env_id, kwargs in CASES]
+    for result in results:
+        print(
+            f"{result['name']:>12}: "
+            f"import {result['median_import_seconds'] * 1000:.0f}ms, "
+            f"gym.make {result['median_make_seconds'] * 1000:.0f}ms"
+            + (
+                f", GUI modules: {result['gui_modules']}"
+                if result["gui_modules"]
+                else ""
+            )
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if any(result["gui_modules"] for result in results):
+        sys.exit("Headless environments imported GUI modules.")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nChange from {args.baseline}:")
+        regressions = compare(results, baseline, args.tolerance, METRICS)
+        if regressions:
+            sys.exit(f"Regressions: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Benchmark step and reset throughput of the environments.
+
+Usage:
+    python benchmarks/throughput.py [--steps 2000] [--repeats 3] [--cases 4x4 ...]
+        [--json results.json] [--baseline baseline.json] [--tolerance 0.25]
+
+Every case is measured for:
+    construct_seconds: time of creating the environment, with a cold in-memory
+        image cache.
+    reset_ms: median time of a reset with a new seed.
+    steps_per_second: random actions, counting every sub-environment of a vector
+        environment, including the resets of finished episodes.
+    peak_memory_mb: peak memory allocated by this process (tracemalloc) while
+        creating the environment and taking steps, measured in a separate pass.
+        The worker processes of async and shared vector environments are not counted.
+The best of --repeats runs is kept for the construction and step timings, which
+makes them less sensitive to other load on the machine.
+
+With --baseline, the results are compared with those of an earlier --json run
+and the script fails if a metric is worse than the baseline by more than
+--tolerance (relative), so it can run before a release or in CI.
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from functools import partial
+
+import gymnasium as gym
+import numpy as np
+
+import visual_puzzle
+from visual_puzzle.image_cache import clear_cache
+
+RUSH_HOUR_BOARD = "ooIBBBGoIJCCGAAJKLoHDDKLxHFFKMoooooM"
+
+# (name, env_id, kwargs, vectorization, num_envs), vectorization being None for
+# a single environment, "sync", "async", "shared" (SharedMemoryVectorEnv) or
+# "custom" (the environment's own vector implementation)
+CASES = (
+    [
+        (
+            f"n_Puzzle-v0/{size}x{size}",
+            "n_Puzzle-v0",
+            {"n_puzzle": size * size - 1, "image_size": size * (240 // size)},
+            None,
+            1,
+        )
+        for size in range(3, 13)
+    ]
+    + [
+        ("n_Puzzle-v0/4x4/index", "n_Puzzle-v0", {"obs_type": "index"}, None, 1),
+        ("jigsaw-v0/4x4", "jigsaw-v0", {}, None, 1),
+        ("jigsaw-v0/4x4/index", "jigsaw-v0", {"obs_type": "index"}, None, 1),
+        (
+            "RushHour-v0/rgb",
+            "RushHour-v0",
+            {"board_description": RUSH_HOUR_BOARD},
+            None,
+            1,
+        ),
+        (
+            "RushHour-v0/text",
+            "RushHour-v0",
+            {"board_description": RUSH_HOUR_BOARD, "obs_type": "text"},
+            None,
+            1,
+        ),
+    ]
+    + [
+        (f"n_Puzzle-v0/4x4/{vectorization}x8", "n_Puzzle-v0", {}, vectorization, 8)
+        for vectorization in ["sync", "async", "shared", "custom"]
+    ]
+    + [
+        (
+            "RushHour-v0/index/customx1024",
+            "RushHour-v0",
+            {"board_description": RUSH_HOUR_BOARD, "obs_type": "index"},
+            "custom",
+            1024,
+        ),
+    ]
+)
+
+# Metrics compared with the baseline, and whether higher values are better
+METRICS = {
+    "construct_seconds": False,
+    "reset_ms": False,
+    "steps_per_second": True,
+    "peak_memory_mb": False,
+}
+
+
+def make(env_id, kwargs, vectorization, num_envs):
+    if vectorization is None:
+        return gym.make(env_id, **kwargs)
+    if vectorization == "custom":
+        return gym.make_vec(
+            env_id, num_envs=num_envs, vectorization_mode="custom", vector_kwargs=kwargs
+        )
+    env_fns = [partial(gym.make, env_id, **kwargs)] * num_envs
+    if vectorization == "sync":
+        return gym.vector.SyncVectorEnv(env_fns)
+    if vectorization == "async":
+        return gym.vector.AsyncVectorEnv(env_fns)
+    return visual_puzzle.SharedMemoryVectorEnv(env_fns)
+
+
+def take_steps(env, actions, vectorization):
+    for action in actions:
+        _, _, terminated, truncated, _ = env.step(action)
+        # Vector environments reset finished episodes themselves
+        if vectorization is None and (terminated or truncated):
+            env.reset()
+
+
+def run(name, env_id, kwargs, vectorization, num_envs, steps, resets, repeats):
+    construct_times = []
+    for _ in range(repeats):
+        clear_cache()
+        start = time.perf_counter()
+        env = make(env_id, kwargs, vectorization, num_envs)
+        construct_times.append(time.perf_counter() - start)
+        env.close()
+    env = make(env_id, kwargs, vectorization, num_envs)
+
+    reset_times = []
+    for seed in range(resets):
+        start = time.perf_counter()
+        env.reset(seed=seed)
+        reset_times.append(time.perf_counter() - start)
+
+    # Actions are sampled up front so only the environment is timed
+    env.action_space.seed(0)
+    # Large batches take at least 20 steps
+    actions = [env.action_space.sample() for _ in range(max(steps // num_envs, 20))]
+    step_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        take_steps(env, actions, vectorization)
+        step_times.append(time.perf_counter() - start)
+    env.close()
+
+    clear_cache()
+    tracemalloc.start()
+    env = make(env_id, kwargs, vectorization, num_envs)
+    env.reset(seed=0)
+    take_steps(env, actions[:100], vectorization)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    env.close()
+
+    return {
+        "name": name,
+        "steps": len(actions) * num_envs,
+        "construct_seconds": min(construct_times),
+        "reset_ms": float(np.median(reset_times)) * 1000,
+        "steps_per_second": len(actions) * num_envs / min(step_times),
+        "peak_memory_mb": peak_memory / 2**20,
+    }
+
+
+def compare(results, baseline, tolerance, metrics=METRICS):
+    """Print the change of every metric and return the regressions.
+
+    metrics maps the compared metrics to whether higher values are better.
+    """
+    baseline = {result["name"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        if result["name"] not in baseline:
+            continue
+        changes = []
+        for metric, higher_is_better in metrics.items():
+            change = result[metric] / baseline[result["name"]][metric] - 1
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{result['name']} {metric}")
+                changes.append(f"{metric} {change:+.0%} (!)")
+            else:
+                changes.append(f"{metric} {change:+.0%}")
+        print(f"{result['name']:>30}: " + ", ".join(changes))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--resets", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--cases",
+        nargs="*",
+        help="Only run the cases whose name contains one of these.",
+    )
+    parser.add_argument("--json", help="Write the results to this file.")
+    parser.add_argument("--baseline", help="Compare with the results in this file.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Largest relative slowdown or growth accepted by --baseline.",
+    )
+    args = parser.parse_args()
+
+    cases = [
+        case
+        for case in CASES
+        if not args.cases or any(pattern in case[0] for pattern in args.cases)
+    ]
+    results = []
+    for case in cases:
+        result = run(*case, args.steps, args.resets, args.repeats)
+        results.append(result)
+        print(
+            f"{result['name']:>30}: "
+            f"{result['steps_per_second']:,.0f} steps/s, "
+            f"reset {result['reset_ms']:.2f}ms, "
+            f"construct {result['construct_seconds'] * 1000:.0f}ms, "
+            f"peak memory {result['peak_memory_mb']:.1f}MB",
+            flush=True,
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nChange from {args.baseline}:")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            sys.exit(f"Regressions: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -41,6 +41,12 @@ setup(
         "Operating System :: OS Independent",
     ],
     python_requires=">=3.10",
+    entry_points={
+        "console_scripts": [
+            "visual-puzzle-gen=visual_puzzle.generate:main",
+            "visual-puzzle-rush-gen=visual_puzzle.rush_generator:main",
+        ],
+    },
     cmdclass={
         'install': CustomInstallCommand,
     },
@@ -0,0 +1,76 @@
+import numpy as np
+
+from visual_puzzle import rush_generator
+from visual_puzzle.rush_generator import analyse_cluster, canonical_board, main
+from visual_puzzle.solvers.rush_hour import RushHourSolver
+
+SEED = 3
+
+
+def _run(tmp_path, name, *args):
+    out = tmp_path / name
+    main(
+        [
+            "--out",
+            str(out),
+            "--count",
+            "1",
+            "--metric",
+            "step",
+            "--seed",
+            str(SEED),
+            "--attempts",
+            "20",
+            "--max-tasks",
+            "1",
+            "--workers",
+            "1",
+            *args,
+        ]
+    )
+    length, board, cluster_size = out.read_text().split()
+    return int(length), board, int(cluster_size)
+
+
+def test_step_metric_honours_exclude_file(tmp_path):
+    length, board, cluster_size = _run(tmp_path, "all.txt")
+
+    # An exclude file listing a board of the cluster that --metric step does not
+    # pick as hardest, like the slide-hardest boards of rush.txt can be
+    step_hardest = set(analyse_cluster(board, "step")[1])
+    slide_length, slide_hardest, _ = analyse_cluster(board, "slide")
+    solver = RushHourSolver(board)
+    neighbours = [canonical_board(solver.board(s)) for s in solver.slides(solver.start)]
+    member = next(b for b in slide_hardest + neighbours if b not in step_hardest)
+    exclude = tmp_path / "rush.txt"
+    exclude.write_text(f"{slide_length} {member} {cluster_size}\n")
+
+    try:
+        _, held_out_board, _ = _run(tmp_path, "held_out.txt", "--exclude", str(exclude))
+    except SystemExit:
+        # No other puzzle was found, so the excluded cluster was left out too
+        return
+    assert held_out_board != board
+
+
+def test_exclude_any_board_of_the_cluster():
+    board = "ooIBBBGoIJCCGAAJKLoHDDKLxHFFKMoooooM"
+    assert analyse_cluster(board, "step") is not None
+    assert analyse_cluster(board, "step", excluded={canonical_board(board)}) is None
+
+
+def test_random_board_blocks_exit_row_on_the_left_only():
+    rng = np.random.default_rng(0)
+    found_left = False
+    for _ in range(2000):
+        rows = np.array(list(rush_generator.random_board(rng, 12))).reshape(6, 6)
+        exit_row = "".join(rows[2])
+        red = exit_row.index("A")
+        right = exit_row[red + 2 :]
+        # Pieces right of the red car must be vertical, i.e. leave the exit row
+        for symbol in set(right) - {"o"}:
+            assert exit_row.count(symbol) == 1
+        found_left |= any(
+            exit_row.count(symbol) > 1 for symbol in set(exit_row[:red]) - {"o"}
+        )
+    assert found_left
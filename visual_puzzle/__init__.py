@@ -1,3 +1,4 @@
+import importlib
 import os
 
 def get_asset_path(filename):
@@ -7,8 +8,34 @@ def get_asset_path(filename):
     current_dir = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(current_dir, 'assets', filename)
 
-from .n_puzzle import n_PuzzleEnv
-from .rush_hour import RushHourEnv
+def get_cache_path(filename):
+    """
+    Returns the full path to a file in the cache directory, creating the directory if needed.
+    The cache directory is $VISUAL_PUZZLE_CACHE_DIR, or ~/.cache/visual_puzzle by default.
+    """
+    cache_dir = os.environ.get(
+        'VISUAL_PUZZLE_CACHE_DIR',
+        os.path.join(os.path.expanduser('~'), '.cache', 'visual_puzzle'),
+    )
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, filename)
+
+# The environments are imported on first access (see __getattr__), so importing the
+# package only registers them, and gym.make loads just the one that is used
+_LAZY_ATTRIBUTES = {
+    'n_PuzzleEnv': 'n_puzzle',
+    'n_PuzzleVectorEnv': 'n_puzzle_vector',
+    'RushHourEnv': 'rush_hour',
+    'RushHourVectorEnv': 'rush_hour_vector',
+    'SharedMemoryVectorEnv': 'shared_memory_vector',
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module('.' + _LAZY_ATTRIBUTES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 from .register import register_environments
 
 register_environments()
\ No newline at end of file
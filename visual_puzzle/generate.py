@@ -0,0 +1,271 @@
+"""Generate datasets of optimally solved puzzle episodes.
+
+Usage:
+    visual-puzzle-gen n_Puzzle-v0 --out data/8_puzzle --episodes 100000 \\
+        --env-kwargs '{"n_puzzle": 8, "scramble": "solvable"}' --frames
+
+Episodes are written in shards of --shard-size episodes to <out>/shard-00000.npz,
+<out>/shard-00001.npz, ... Each shard is generated by one worker process and
+written atomically, so an interrupted run continues where it stopped when it is
+started again with the same arguments. Episode i is reset with seed --seed + i.
+
+n_Puzzle-v0 boards are uniformly random solvable boards up to the 8-puzzle. The
+15-puzzle and larger ones default to the "random_walk" scramble (scramble_moves
+random moves from the goal), as their uniformly random boards take the optimal
+solver minutes each.
+
+Every shard holds, for its E episodes with T actions in total:
+    seeds (E,), lengths (E,): reset seed and optimal number of actions.
+    boards (E, ...): the initial boards (bytes for RushHour-v0).
+    actions (T, ...), action_offsets (E + 1,): the actions of episode e are
+        actions[action_offsets[e]:action_offsets[e + 1]].
+    frames (T + E, ...), frame_offsets (E + 1,): with --frames, the observation
+        after reset and after every action.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+ENV_IDS = ["n_Puzzle-v0", "jigsaw-v0", "RushHour-v0"]
+
+
+def _make_env(env_id, env_kwargs, seed):
+    import gymnasium as gym
+
+    import visual_puzzle  # noqa: F401, registers the environments
+
+    kwargs = dict(env_kwargs)
+    if env_id == "n_Puzzle-v0":
+        kwargs.setdefault("scramble", _default_scramble(kwargs))
+    if env_id == "RushHour-v0":
+        # Every episode draws its board with the seed passed to reset, and the
+        # piece colors come from the shard's seed, so a rerun renders the same frames
+        kwargs.setdefault("resample_on_reset", True)
+        kwargs.setdefault("color_seed", seed)
+    return gym.make(env_id, **kwargs).unwrapped
+
+
+def _default_scramble(env_kwargs):
+    # n_PuzzleEnv defaults to the 15-puzzle
+    return "solvable" if env_kwargs.get("n_puzzle", 15) <= 8 else "random_walk"
+
+
+def _check_env_kwargs(env_id, env_kwargs):
+    # Reject boards the solver cannot label in reasonable time
+    if env_id != "n_Puzzle-v0":
+        return
+    scramble = env_kwargs.get("scramble", _default_scramble(env_kwargs))
+    if scramble == "shuffle":
+        raise ValueError(
+            'The "shuffle" scramble draws unsolvable boards, use "solvable" or '
+            '"random_walk".'
+        )
+    if scramble == "solvable" and env_kwargs.get("n_puzzle", 15) > 8:
+        raise ValueError(
+            "Optimally solving uniformly random boards larger than the 8-puzzle "
+            'takes minutes per board, use the "random_walk" scramble with a '
+            "bounded scramble_moves."
+        )
+
+
+def _solve(env_id, env):
+    # Optimal actions for the current board of env
+    if env_id == "n_Puzzle-v0":
+        from .solvers.n_puzzle import get_solver
+
+        return get_solver(env.size).solve(env.board)
+    if env_id == "RushHour-v0":
+        from .solvers.rush_hour import RushHourSolver
+
+        return RushHourSolver(env.board).solve()[1]
+
+    from .solvers import jigsaw
+
+    actions = jigsaw.solve(env.board)
+    if getattr(env, "action_type", "positions") == "flat":
+        actions = [
+            (r1 * env.size + c1) * env.n + r2 * env.size + c2
+            for (r1, c1), (r2, c2) in actions
+        ]
+    return actions
+
+
+def _action_shape(env_id, env):
+    if env_id == "RushHour-v0":
+        return (2,)
+    if env_id == "jigsaw-v0" and getattr(env, "action_type", "positions") != "flat":
+        return (2, 2)
+    return ()
+
+
+def shard_path(out, shard_index):
+    return os.path.join(out, f"shard-{shard_index:05d}.npz")
+
+
+def generate_shard(config, shard_index):
+    """Generate one shard of episodes and write it to disk.
+
+    Args:
+        config (dict): The run configuration, see main.
+        shard_index (int): Index of the shard, which decides its episodes and seeds.
+
+    Returns:
+        int: The number of episodes written.
+    """
+    env_id = config["env_id"]
+    first = shard_index * config["shard_size"]
+    last = min(first + config["shard_size"], config["episodes"])
+    env = _make_env(env_id, config["env_kwargs"], config["seed"] + first)
+    path = shard_path(config["out"], shard_index)
+
+    # Frames are appended to a raw temporary file as they are rendered, so a
+    # worker never holds the frames of a whole shard in memory
+    frames_path = f"{path}.{os.getpid()}.frames.tmp"
+    frames_file = open(frames_path, "wb") if config["frames"] else None
+    try:
+        seeds, boards, actions, lengths = [], [], [], []
+        for episode in range(first, last):
+            seed = config["seed"] + episode
+            observation, _ = env.reset(seed=seed)
+            board = env.board.copy()
+            episode_actions = _solve(env_id, env)
+            if frames_file is not None:
+                frame = np.asarray(observation)
+                frames_file.write(frame.tobytes())
+
+            # Replaying the solution checks it and renders the frames
+            terminated = len(episode_actions) == 0
+            for action in episode_actions:
+                observation, _, terminated, _, _ = env.step(action)
+                if frames_file is not None:
+                    frame = np.asarray(observation)
+                    frames_file.write(frame.tobytes())
+            assert terminated, f"The solution for seed {seed} does not solve the board."
+
+            seeds.append(seed)
+            boards.append(board.astype("S1") if env_id == "RushHour-v0" else board)
+            actions.extend(episode_actions)
+            lengths.append(len(episode_actions))
+        env.close()
+
+        action_offsets = np.concatenate([[0], np.cumsum(lengths)])
+        arrays = {
+            "seeds": np.array(seeds, dtype=np.int64),
+            "lengths": np.array(lengths, dtype=np.int32),
+            "boards": np.stack(boards),
+            "actions": np.array(actions, dtype=np.int32).reshape(
+                (-1,) + _action_shape(env_id, env)
+            ),
+            "action_offsets": action_offsets,
+        }
+        if frames_file is not None:
+            frames_file.close()
+            arrays["frame_offsets"] = action_offsets + np.arange(len(action_offsets))
+
+        # Write to a temporary file first so a shard on disk is always complete
+        temporary_path = f"{path}.{os.getpid()}.tmp.npz"
+        with zipfile.ZipFile(
+            temporary_path, "w", compression=zipfile.ZIP_DEFLATED
+        ) as archive:
+            for name, array in arrays.items():
+                with archive.open(f"{name}.npy", "w", force_zip64=True) as f:
+                    np.lib.format.write_array(f, array, allow_pickle=False)
+            if frames_file is not None:
+                # The frames are copied from the temporary file in chunks
+                num_frames = int(action_offsets[-1]) + len(lengths)
+                header = {
+                    "descr": np.lib.format.dtype_to_descr(frame.dtype),
+                    "fortran_order": False,
+                    "shape": (num_frames,) + frame.shape,
+                }
+                with archive.open("frames.npy", "w", force_zip64=True) as f:
+                    np.lib.format.write_array_header_1_0(f, header)
+                    with open(frames_path, "rb") as source:
+                        shutil.copyfileobj(source, f, 2**24)
+        os.replace(temporary_path, path)
+    finally:
+        if frames_file is not None:
+            frames_file.close()
+            os.remove(frames_path)
+    return last - first
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="visual-puzzle-gen",
+        description=__doc__.splitlines()[0],
+        epilog=__doc__.split("\n\n", 2)[2],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("env_id", choices=ENV_IDS)
+    parser.add_argument("--out", required=True, help="Output directory.")
+    parser.add_argument("--episodes", type=int, required=True)
+    parser.add_argument("--shard-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--frames", action="store_true", help="Store the observations.")
+    parser.add_argument(
+        "--env-kwargs",
+        type=json.loads,
+        default={},
+        help="JSON object of keyword arguments for gym.make.",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(), help="Worker processes."
+    )
+    args = parser.parse_args(argv)
+    try:
+        _check_env_kwargs(args.env_id, args.env_kwargs)
+    except ValueError as error:
+        parser.error(str(error))
+
+    config = {
+        "env_id": args.env_id,
+        "out": args.out,
+        "episodes": args.episodes,
+        "shard_size": args.shard_size,
+        "seed": args.seed,
+        "frames": args.frames,
+        "env_kwargs": args.env_kwargs,
+    }
+
+    # The manifest makes sure a resumed run continues the same dataset
+    os.makedirs(args.out, exist_ok=True)
+    manifest_path = os.path.join(args.out, "manifest.json")
+    manifest = {key: value for key, value in config.items() if key != "out"}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            if json.load(f) != manifest:
+                sys.exit(
+                    f"{args.out} holds a dataset generated with other arguments, "
+                    f"see {manifest_path}."
+                )
+    else:
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    num_shards = -(-args.episodes // args.shard_size)
+    pending = [
+        index
+        for index in range(num_shards)
+        if not os.path.exists(shard_path(args.out, index))
+    ]
+    print(f"{num_shards - len(pending)}/{num_shards} shards already done.")
+
+    done = num_shards - len(pending)
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(generate_shard, config, index) for index in pending]
+        for future in as_completed(futures):
+            future.result()
+            done += 1
+            print(f"{done}/{num_shards} shards done.", flush=True)
+
+
+if __name__ == "__main__":
+    main()
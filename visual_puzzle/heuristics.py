@@ -0,0 +1,154 @@
+import numpy as np
+
+# Boards are square integer arrays in which tile k belongs at the flat position
+# k, i.e. at row k // size and column k % size. Tile 0 is the blank of the
+# n-Puzzle; Jigsaw boards have no blank and pass has_blank=False.
+HEURISTICS = ["manhattan_distance", "misplaced_tiles", "linear_conflict"]
+JIGSAW_HEURISTICS = HEURISTICS + ["min_swaps"]
+
+
+def manhattan_distance(board, has_blank=True):
+    """Sum of the Manhattan distances of all (non-blank) tiles to their goal cells."""
+    size = board.shape[0]
+    goal_rows, goal_cols = np.divmod(board, size)
+    rows, cols = np.indices(board.shape)
+    distances = np.abs(goal_rows - rows) + np.abs(goal_cols - cols)
+    if has_blank:
+        distances = distances[board != 0]
+    return int(distances.sum())
+
+
+def tile_manhattan_distance(tile, pos, size, has_blank=True):
+    """Manhattan distance of a single tile at pos to its goal cell."""
+    if has_blank and tile == 0:
+        return 0
+    goal_row, goal_col = divmod(int(tile), size)
+    return abs(goal_row - pos[0]) + abs(goal_col - pos[1])
+
+
+def misplaced_tiles(board, has_blank=True):
+    """Number of (non-blank) tiles that are not in their goal cell."""
+    misplaced = board != np.arange(board.size).reshape(board.shape)
+    if has_blank:
+        misplaced &= board != 0
+    return int(np.count_nonzero(misplaced))
+
+
+def tile_misplaced(tile, pos, size, has_blank=True):
+    """1 if a (non-blank) tile at pos is not in its goal cell, else 0."""
+    return int((not has_blank or tile != 0) and tile != pos[0] * size + pos[1])
+
+
+def _line_conflict(goal_offsets):
+    # Linear conflict of one line, given the goal offsets along the line of the
+    # tiles that belong to it, in their current order. Repeatedly removes the
+    # tile involved in the most conflicts; every removal costs two moves.
+    goal_offsets = list(goal_offsets)
+    removed = 0
+    while len(goal_offsets) > 1:
+        conflicts = [
+            sum(other < offset for other in goal_offsets[index + 1 :])
+            + sum(other > offset for other in goal_offsets[:index])
+            for index, offset in enumerate(goal_offsets)
+        ]
+        most_conflicts = max(conflicts)
+        if most_conflicts == 0:
+            break
+        goal_offsets.pop(conflicts.index(most_conflicts))
+        removed += 1
+    return 2 * removed
+
+
+def row_conflict(board, row, has_blank=True):
+    """Linear conflict of the tiles in a row that also belong to that row."""
+    size = board.shape[0]
+    return _line_conflict(
+        tile % size
+        for tile in board[row]
+        if (not has_blank or tile != 0) and tile // size == row
+    )
+
+
+def column_conflict(board, col, has_blank=True):
+    """Linear conflict of the tiles in a column that also belong to that column."""
+    size = board.shape[0]
+    return _line_conflict(
+        tile // size
+        for tile in board[:, col]
+        if (not has_blank or tile != 0) and tile % size == col
+    )
+
+
+def linear_conflict(board, has_blank=True):
+    """Extra moves from linear conflicts, to be added to the Manhattan distance."""
+    size = board.shape[0]
+    return sum(
+        row_conflict(board, i, has_blank) + column_conflict(board, i, has_blank)
+        for i in range(size)
+    )
+
+
+def min_swaps(board):
+    """Minimum number of tile swaps that solve a Jigsaw board.
+
+    The board is a permutation that sends every cell to the goal cell of its tile,
+    and a permutation of n cells with c cycles needs exactly n - c swaps.
+    """
+    return board.size - PermutationCycles(board).num_cycles
+
+
+class PermutationCycles:
+    def __init__(self, board):
+        """The cycles of a board's permutation, kept up to date as tiles are swapped.
+
+        Every cycle has a label, and a swap either merges the cycles of the two
+        cells or splits their common cycle in two. Only the cells of the smaller
+        of the two parts are walked and relabeled.
+
+        Args:
+            board (np.ndarray): The board, see min_swaps.
+
+        Attributes:
+            num_cycles (int): The number of cycles, fixed tiles included.
+        """
+        tiles = board.ravel()
+        self.labels = np.full(tiles.size, -1, dtype=np.int64)
+        self.num_cycles = 0
+        for start in range(tiles.size):
+            if self.labels[start] < 0:
+                cells, cell = [start], int(tiles[start])
+                while cell != start:
+                    cells.append(cell)
+                    cell = int(tiles[cell])
+                self.labels[cells] = start
+                self.num_cycles += 1
+        self._next_label = tiles.size
+
+    def swap(self, board, cell_1, cell_2):
+        """Update the cycles after the tiles at two flat cells were swapped on board."""
+        if cell_1 == cell_2:
+            return
+        tiles = board.ravel()
+        merge = self.labels[cell_1] != self.labels[cell_2]
+
+        # Walk from both cells at once. When merging, the walk from each cell runs
+        # through the old cycle of the other cell; when splitting, through one of
+        # the new cycles. The first walk to finish covers the smaller part.
+        starts = (cell_1, cell_2)
+        stops = (cell_2, cell_1) if merge else starts
+        walks, current = ([], []), [cell_1, cell_2]
+        k = 0
+        while True:
+            current[k] = int(tiles[current[k]])
+            walks[k].append(current[k])
+            if current[k] == stops[k]:
+                break
+            k = 1 - k
+
+        if merge:
+            self.labels[walks[k]] = self.labels[starts[k]]
+            self.num_cycles -= 1
+        else:
+            self.labels[walks[k]] = self._next_label
+            self._next_label += 1
+            self.num_cycles += 1
@@ -0,0 +1,227 @@
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from .tiles import make_tiles
+
+# Upper bound on the bytes held by the cache, see set_cache_size
+_max_bytes = 256 * 2**20
+_entries = OrderedDict()  # key -> (value, num_bytes), least recently used first
+_num_bytes = 0
+_lock = threading.Lock()
+
+
+def set_cache_size(max_bytes: int):
+    """Set how many bytes of images and tiles the process-wide cache keeps.
+
+    Least recently used entries are evicted first. Environments keep the arrays
+    they use, so eviction only stops new environments from reusing them.
+    """
+    global _max_bytes
+    with _lock:
+        _max_bytes = max_bytes
+        _evict()
+
+
+def clear_cache():
+    """Drop every cached image and tile set."""
+    global _num_bytes
+    with _lock:
+        _entries.clear()
+        _num_bytes = 0
+
+
+def _evict():
+    global _num_bytes
+    while _num_bytes > _max_bytes and _entries:
+        _, (_, num_bytes) = _entries.popitem(last=False)
+        _num_bytes -= num_bytes
+
+
+def _cached(key, build):
+    # Return the cached value for key, building it with build() -> (value, num_bytes)
+    global _num_bytes
+    with _lock:
+        if key in _entries:
+            _entries.move_to_end(key)
+            return _entries[key][0]
+    value, num_bytes = build()
+    with _lock:
+        if key not in _entries and num_bytes <= _max_bytes:
+            _entries[key] = (value, num_bytes)
+            _num_bytes += num_bytes
+            _evict()
+    return value
+
+
+def _shared_array(array):
+    # Copy an array into anonymous shared memory and make it read-only. Processes
+    # forked afterwards (e.g. AsyncVectorEnv workers) map the same physical pages.
+    buffer = mmap.mmap(-1, max(array.nbytes, 1))
+    shared = np.frombuffer(buffer, dtype=array.dtype, count=array.size)
+    shared = shared.reshape(array.shape)
+    shared[...] = array
+    shared.flags.writeable = False
+    return shared
+
+
+def _image_key(image_path):
+    # Identify a file by its path and modification time, so edited files are reloaded
+    image_path = os.path.abspath(image_path)
+    return image_path, os.stat(image_path).st_mtime_ns
+
+
+def get_image(image_path: str, image_size: int, filter_effects: Optional[str] = None):
+    """Load, resize and filter an image once per process.
+
+    Args:
+        image_path (str): Path to the image file.
+        image_size (int): Width and height of the resized image in pixels.
+        filter_effects (str, optional): Name of a PIL ImageFilter to apply. Defaults to None.
+
+    Returns:
+        tuple: (resized image, resized and filtered image), both PIL.Image objects shared
+            by every caller, which must not modify them.
+    """
+    key = ("image", _image_key(image_path), image_size, filter_effects)
+
+    def build():
+        original_image = Image.open(image_path).resize((image_size, image_size))
+        image = original_image
+        if filter_effects:
+            image = image.filter(getattr(ImageFilter, filter_effects.upper()))
+        num_bytes = 2 * image_size * image_size * len(image.getbands())
+        return (original_image, image), num_bytes
+
+    return _cached(key, build)
+
+
+def get_tile_images(
+    image_path: str, image_size: int, size: int, filter_effects: Optional[str] = None
+):
+    """Return the size x size PIL tiles of get_image(...)[1] in row-major order, shared by every caller."""
+    key = ("tile_images", _image_key(image_path), image_size, size, filter_effects)
+
+    def build():
+        image = get_image(image_path, image_size, filter_effects)[1]
+        tile_size = image_size // size
+        tiles = tuple(
+            image.crop(
+                (j * tile_size, i * tile_size, (j + 1) * tile_size, (i + 1) * tile_size)
+            )
+            for i in range(size)
+            for j in range(size)
+        )
+        return tiles, image_size * image_size * len(image.getbands())
+
+    return _cached(key, build)
+
+
+def get_tiles(
+    image_path: str,
+    image_size: int,
+    size: int,
+    filter_effects: Optional[str] = None,
+    obs_size: Optional[int] = None,
+    grayscale: bool = False,
+    blank: bool = False,
+    channels_first: bool = False,
+):
+    """Return the tiles of an image as one contiguous, read-only uint8 array.
+
+    The array is built once per process for each combination of arguments and lives
+    in shared memory, so environments created before forking share it with their
+    worker processes.
+
+    Args:
+        image_path (str): Path to the image file.
+        image_size (int): Width and height of the resized image in pixels.
+        size (int): Number of tiles per row and column.
+        filter_effects (str, optional): Name of a PIL ImageFilter to apply. Defaults to None.
+        obs_size (int, optional): Width and height in pixels the tiles are drawn at.
+            Defaults to image_size.
+        grayscale (bool): If True, the tiles have a single luminance channel. Defaults to False.
+        blank (bool): If True, tile 0 is black, as the empty space of the n-Puzzle.
+            Defaults to False.
+        channels_first (bool): If True, the array is (n, channels, tile_size, tile_size)
+            instead of (n, tile_size, tile_size, channels). Defaults to False.
+
+    Returns:
+        np.ndarray: The tiles, see visual_puzzle.tiles.make_tiles.
+    """
+    obs_size = obs_size or image_size
+    key = (
+        "tiles",
+        _image_key(image_path),
+        image_size,
+        size,
+        filter_effects,
+        obs_size,
+        grayscale,
+        blank,
+        channels_first,
+    )
+
+    def build():
+        image = get_image(image_path, image_size, filter_effects)[1]
+        if obs_size != image_size:
+            image = image.resize((obs_size, obs_size))
+        tiles = make_tiles(image, size, grayscale=grayscale)
+        if blank:
+            tiles[0] = 0
+        if channels_first:
+            tiles = tiles.transpose(0, 3, 1, 2)
+        tiles = _shared_array(np.ascontiguousarray(tiles))
+        return tiles, tiles.nbytes
+
+    return _cached(key, build)
+
+
+def get_goal_frame(
+    image_path: str,
+    image_size: int,
+    size: int,
+    filter_effects: Optional[str] = None,
+    blank: bool = False,
+):
+    """Return the solved board as one read-only uint8 RGB array, shared by every caller.
+
+    The frame is assembled from get_tiles(...) in row-major order, so it has the
+    same grid lines (and, with blank=True, the same black blank tile) as the
+    observations, and is built once per process for each combination of arguments.
+
+    Args:
+        image_path (str): Path to the image file.
+        image_size (int): Width and height of the resized image in pixels.
+        size (int): Number of tiles per row and column.
+        filter_effects (str, optional): Name of a PIL ImageFilter to apply. Defaults to None.
+        blank (bool): If True, tile 0 is black, as the empty space of the n-Puzzle.
+            Defaults to False.
+
+    Returns:
+        np.ndarray: Array of shape (image_size, image_size, 3).
+    """
+    key = (
+        "goal_frame",
+        _image_key(image_path),
+        image_size,
+        size,
+        filter_effects,
+        blank,
+    )
+
+    def build():
+        tiles = get_tiles(image_path, image_size, size, filter_effects, blank=blank)
+        tile_size = tiles.shape[1]
+        frame = tiles.reshape(size, size, tile_size, tile_size, -1).transpose(
+            0, 2, 1, 3, 4
+        )
+        frame = _shared_array(frame.reshape(size * tile_size, size * tile_size, -1))
+        return frame, frame.nbytes
+
+    return _cached(key, build)
@@ -0,0 +1,110 @@
+import glob
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Sequence, Union
+
+import numpy as np
+
+IMAGE_EXTENSIONS = (".bmp", ".gif", ".jpeg", ".jpg", ".png", ".tif", ".tiff", ".webp")
+
+
+def list_images(image_dataset: Union[str, Sequence[str]]):
+    """Resolve an image dataset to a list of image paths.
+
+    Args:
+        image_dataset (str or Sequence[str]): A directory (every image file in it,
+            recursively), a glob pattern (e.g. "photos/*.jpg"), a manifest file with one
+            image path per line (relative paths are relative to the manifest), or a
+            sequence of image paths.
+
+    Returns:
+        list[str]: The image paths, sorted for directories and glob patterns.
+
+    Raises:
+        ValueError: If the dataset contains no images.
+    """
+    if not isinstance(image_dataset, str):
+        paths = list(image_dataset)
+    elif os.path.isdir(image_dataset):
+        paths = sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(image_dataset)
+            for name in names
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+    elif os.path.isfile(image_dataset) and not image_dataset.lower().endswith(
+        IMAGE_EXTENSIONS
+    ):
+        root = os.path.dirname(image_dataset)
+        with open(image_dataset) as f:
+            lines = [line.strip() for line in f]
+        paths = [os.path.join(root, line) for line in lines if line]
+    else:
+        paths = sorted(glob.glob(image_dataset, recursive=True))
+
+    if not paths:
+        raise ValueError(f"No images found for the image dataset {image_dataset!r}.")
+    return paths
+
+
+class ImagePrefetcher:
+    def __init__(
+        self,
+        image_paths: Sequence[str],
+        load: Callable,
+        prefetch: int = 8,
+        num_workers: int = 4,
+    ):
+        """Draw random images from a dataset, loading the next ones in background threads.
+
+        The order in which images are drawn only depends on the seed, so it is the
+        same however fast the threads are. Up to prefetch images are loaded ahead.
+
+        Args:
+            image_paths (Sequence[str]): The images to draw from, with replacement.
+            load (Callable): Function taking an image path and returning what the
+                environment needs from it (decoded, resized and tiled image).
+            prefetch (int): Number of images loaded ahead. Defaults to 8.
+            num_workers (int): Number of loading threads. Defaults to 4.
+        """
+        assert prefetch >= 1, "At least one image has to be prefetched."
+        self.image_paths = list(image_paths)
+        self.load = load
+        self.prefetch = prefetch
+        self._executor = ThreadPoolExecutor(
+            max_workers=num_workers, thread_name_prefix="visual_puzzle_prefetch"
+        )
+        self._queue = deque()
+        self._rng = None
+
+    @property
+    def seeded(self):
+        return self._rng is not None
+
+    def seed(self, seed: Optional[int] = None):
+        """Restart the sequence of drawn images from a seed (None for a random one)."""
+        for _, future in self._queue:
+            future.cancel()
+        self._queue.clear()
+        self._rng = np.random.default_rng(seed)
+        self._fill()
+
+    def _fill(self):
+        while len(self._queue) < self.prefetch:
+            path = self.image_paths[self._rng.integers(len(self.image_paths))]
+            self._queue.append((path, self._executor.submit(self.load, path)))
+
+    def next(self):
+        """Return (image path, loaded image) of the next image, waiting only if it is not loaded yet."""
+        if self._rng is None:
+            self.seed()
+        path, future = self._queue.popleft()
+        self._fill()
+        return path, future.result()
+
+    def close(self):
+        for _, future in self._queue:
+            future.cancel()
+        self._queue.clear()
+        self._executor.shutdown(wait=False)
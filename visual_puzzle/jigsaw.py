@@ -1,15 +1,39 @@
 import gymnasium as gym
 import numpy as np
 from gymnasium import spaces
-from PIL import Image, ImageTk, ImageFilter, ImageDraw
-import tkinter as tk
-from typing import Optional
+from PIL import Image
+from typing import Optional, Sequence, Union
 import os
 from . import get_asset_path
+from . import heuristics, timing
+from .image_cache import get_goal_frame, get_image, get_tile_images, get_tiles
+from .image_dataset import ImagePrefetcher, list_images
+from .tiles import (
+    OBS_TYPES,
+    TileCanvas,
+    board_observation,
+    check_observation_buffer,
+    index_dtype,
+    observation_shape,
+)
 
 
 class JigsawEnv(gym.Env):
     metadata = {"render_modes": ["human"], "render_fps": 1}
+    # Phases timed by enable_timing, mapped to the methods they time
+    TIMED_PHASES = {
+        "step": "step",
+        "reset": "reset",
+        "decode_action": "_decode_action",
+        "move": "_swap",
+        "draw": "_draw_tile",
+        "is_solved": "_is_solved",
+        "get_obs": "_get_obs",
+        "get_info": "_get_info",
+        "render": "_render_frame",
+        "draw_board": "_draw_board",
+        "reset_heuristics": "_reset_heuristics",
+    }
 
     def __init__(
         self,
@@ -19,6 +43,16 @@ class JigsawEnv(gym.Env):
         image_size: int = 240,
         filter_effects: Optional[str] = None,
         time_steps_limit: Optional[int] = None,
+        pixel_equality_check: bool = False,
+        info_heuristics: Sequence[str] = ("manhattan_distance",),
+        info_images: str = "always",
+        obs_type: str = "rgb",
+        obs_size: Optional[int] = None,
+        channels_first: bool = False,
+        image_dataset: Optional[Union[str, Sequence[str]]] = None,
+        prefetch: int = 8,
+        num_workers: int = 4,
+        action_type: str = "positions",
     ):
         """Initialize the n-Puzzle environment.
 
@@ -41,6 +75,37 @@ class JigsawEnv(gym.Env):
                 Defaults to None.
             time_steps_limit (int, optional): Maximum number of time steps for each episode. If None, there is no limit.
                 Defaults to None.
+            pixel_equality_check (bool): If True, the puzzle counts as solved when it looks identical to the
+                goal image, so swapping pixel-identical tiles does not prevent termination. Otherwise the
+                board itself has to match the goal board. Defaults to False.
+            info_heuristics (Sequence[str]): Heuristics reported in the info dict, kept up to date
+                incrementally on every swap. Supported: "manhattan_distance" (total displacement of the
+                tiles), "misplaced_tiles", "linear_conflict" and "min_swaps" (the minimum number of swaps
+                that solve the board). Every tile counts, tile 0 included. Defaults to ("manhattan_distance",).
+            info_images (str): When the info dict holds the PIL images "original_image" and "goal_image":
+                "always", "reset" (only the info returned by reset, as they only change on reset) or
+                "never". Both stay available as the original_image_before_shuffle_or_filter and
+                final_image attributes. Defaults to "always".
+            obs_type (str): The observation format. "rgb" for an RGB image, "grayscale" for a
+                single-channel image, "index" for the (size, size) board of tile indices and
+                "one_hot" for its (size, size, n) one-hot encoding. Defaults to "rgb".
+            obs_size (int, optional): Width and height in pixels of "rgb" and "grayscale" observations.
+                The image is resized once and the tiles are painted at this size, so small
+                observations are not downsampled on every step. Must be a multiple of the grid size.
+                Defaults to image_size.
+            channels_first (bool): If True, observations are laid out as (channels, height, width)
+                instead of (height, width, channels). Defaults to False.
+            image_dataset (str or Sequence[str], optional): A directory, glob pattern, manifest file or
+                list of images, see visual_puzzle.image_dataset.list_images. If given, every reset draws
+                a new image from it (replacing image_path), in an order that only depends on the seed.
+                Defaults to None.
+            prefetch (int): In image dataset mode, the number of upcoming images that are decoded,
+                resized, filtered and tiled ahead of time by background threads. Defaults to 8.
+            num_workers (int): In image dataset mode, the number of background loading threads.
+                Defaults to 4.
+            action_type (str): How actions are encoded. "positions" for [[row_1, col_1], [row_2, col_2]]
+                (a MultiDiscrete space), "flat" for the single integer cell_1 * n + cell_2 (a Discrete(n * n)
+                space), where cell = row * size + col. Defaults to "positions".
 
         Attributes:
             size (int): The size of the puzzle grid (sqrt(n+1)xsqrt(n+1) for n-Puzzle, Eg. 4x4 for 15-puzzle).
@@ -60,26 +125,24 @@ class JigsawEnv(gym.Env):
 
 
         Note:
-            The environment uses a discrete action space with 4 possible actions:
-            0: move up, 1: move right, 2: move down, 3: move left.
-            The observation space is a self.image_sizexself.image_sizex3 RGB image of the current puzzle state.
+            An action swaps the tiles at two board positions, see action_type. Swapping a
+            position with itself leaves the board unchanged.
+            By default the observation space is a self.image_sizexself.image_sizex3 RGB image of the current
+            puzzle state, see obs_type, obs_size and channels_first for the other formats.
         """
 
         super(JigsawEnv, self).__init__()
 
+        self._image_paths = None
+        if image_dataset is not None:
+            self._image_paths = list_images(image_dataset)
+            image_path = self._image_paths[0]
         if image_path is None:
             image_path = get_asset_path("example.png")
 
         self.size = np.sqrt(n_puzzle + 1).astype(int)
         self.n = self.size**2
         self.image_size = image_size
-        # Load and preprocess the input image
-        self.original_image = Image.open(image_path)
-        self.original_image = self.original_image.resize(
-            (self.image_size, self.image_size)
-        )
-        self.original_image_before_shuffle_or_filter = self.original_image.copy()
-
         assert filter_effects in [
             "BLUR",
             "CONTOUR",
@@ -93,10 +156,7 @@ class JigsawEnv(gym.Env):
             "SMOOTH_MORE",
             None,
         ], "Invalid filter effect."
-        if filter_effects:
-            self.original_image = self.original_image.filter(
-                getattr(ImageFilter, filter_effects.upper())
-            )
+        self.filter_effects = filter_effects
 
         self.tile_size = int(self.image_size / self.size)  # 100
 
@@ -104,27 +164,43 @@ class JigsawEnv(gym.Env):
             self.image_size, n_puzzle
         ), "Invalid combination of image size and number of tiles."
 
-        # Create image tiles
-        self.tiles = []
-        for i in range(self.size):
-            for j in range(self.size):
-                tile = self.original_image.crop(
-                    (
-                        j * self.tile_size,
-                        i * self.tile_size,
-                        (j + 1) * self.tile_size,
-                        (i + 1) * self.tile_size,
-                    )
-                )
-                self.tiles.append(tile)
+        self.pixel_equality_check = pixel_equality_check
+        self._goal_board = np.arange(self.n).reshape((self.size, self.size))
+        self._num_in_place = self.n
+
+        assert all(
+            name in heuristics.JIGSAW_HEURISTICS for name in info_heuristics
+        ), "Invalid heuristic."
+        self.info_heuristics = tuple(info_heuristics)
+
+        assert info_images in ["always", "reset", "never"], "Invalid info_images."
+        self.info_images = info_images
+
+        assert obs_type in OBS_TYPES, "Invalid observation type."
+        self.obs_type = obs_type
+        self.obs_size = obs_size if obs_size else self.image_size
+        assert (
+            self.obs_size % self.size == 0
+        ), "Invalid combination of observation size and number of tiles."
+        self.channels_first = channels_first
+        self._setup_observations()
+        self._use_image(image_path, self._load_image(image_path))
+
+        self._prefetcher = None
+        if self._image_paths is not None:
+            self._prefetcher = ImagePrefetcher(
+                self._image_paths, self._load_image, prefetch, num_workers
+            )
 
         # Define action and observation spaces
-        self.action_space = spaces.MultiDiscrete(
-            np.array([[self.size, self.size], [self.size, self.size]])
-        )
-        self.observation_space = spaces.Box(
-            low=0, high=255, shape=(self.image_size, self.image_size, 3), dtype=np.uint8
-        )
+        assert action_type in ["positions", "flat"], "Invalid action type."
+        self.action_type = action_type
+        if action_type == "flat":
+            self.action_space = spaces.Discrete(self.n * self.n)
+        else:
+            self.action_space = spaces.MultiDiscrete(
+                np.array([[self.size, self.size], [self.size, self.size]])
+            )
 
         self.render_mode = render_mode
         self.time_steps_limit = time_steps_limit if time_steps_limit else np.inf
@@ -136,6 +212,7 @@ class JigsawEnv(gym.Env):
         self.current_time_step = 0
         self.window = None
         self.canvas = None
+        self._timer = None
 
         self.valid_positions = np.array(
             [[i, j] for i in range(self.size) for j in range(self.size)]
@@ -143,20 +220,79 @@ class JigsawEnv(gym.Env):
 
         self.board = np.arange(self.n).reshape((self.size, self.size))
 
-        self.final_image = Image.new("RGB", (self.image_size, self.image_size))
-        _draw_ = ImageDraw.Draw(self.final_image)
-        for i in range(self.size):
-            for j in range(self.size):
-                tile_index = self.board[i, j]
-                tile = self.tiles[tile_index]
-                self.final_image.paste(tile, (j * self.tile_size, i * self.tile_size))
-                x = j * self.tile_size
-                y = i * self.tile_size
-                _draw_.rectangle(
-                    [x, y, x + self.tile_size, y + self.tile_size],
-                    outline="black",
-                    width=1,
-                )
+    def _load_image(self, image_path):
+        # Everything derived from the source image. In image dataset mode this runs
+        # in the prefetch threads, so it must not modify the environment.
+        # The image and tiles are cached per process, so environments sharing an
+        # image share the work.
+        original_image, image = get_image(
+            image_path, self.image_size, self.filter_effects
+        )
+
+        # Pre-convert the tiles to uint8 arrays with the grid lines baked in, so
+        # observations are assembled by array copies.
+        tile_arrays = get_tiles(
+            image_path, self.image_size, self.size, self.filter_effects
+        )
+        obs_tiles = None
+        if self._canvas is not None:
+            obs_tiles = get_tiles(
+                image_path,
+                self.image_size,
+                self.size,
+                self.filter_effects,
+                obs_size=self.obs_size,
+                grayscale=self.obs_type == "grayscale",
+                channels_first=self.channels_first,
+            )
+
+        # The solved board, shared by every environment with this image and
+        # configuration. The PIL goal image is only made from it when used.
+        goal_frame = get_goal_frame(
+            image_path, self.image_size, self.size, self.filter_effects
+        )
+
+        # Termination is decided on the integer board. Each tile index maps to a
+        # class, and with pixel_equality_check pixel-identical tiles share one.
+        tile_classes = np.arange(self.n)
+        if self.pixel_equality_check:
+            tile_classes = self._get_pixel_tile_classes(tile_arrays)
+
+        return {
+            "original_image": original_image,
+            "image": image,
+            "goal_frame": goal_frame,
+            "tile_arrays": tile_arrays,
+            "obs_tiles": obs_tiles,
+            "tile_classes": tile_classes,
+        }
+
+    def _use_image(self, image_path, loaded):
+        # Switch to an image prepared by _load_image
+        self.image_path = image_path
+        self.original_image_before_shuffle_or_filter = loaded["original_image"]
+        self.original_image = loaded["image"]
+        self._goal_frame = loaded["goal_frame"]
+        self._tile_arrays = loaded["tile_arrays"]
+        self._obs_tiles = loaded["obs_tiles"]
+        self._tile_classes = loaded["tile_classes"]
+        self._goal_classes = self._tile_classes[self._goal_board]
+        self._final_image = None
+
+    @property
+    def final_image(self):
+        # The PIL goal image is made from the cached goal frame on first use
+        if self._final_image is None:
+            self._final_image = Image.fromarray(self._goal_frame)
+        return self._final_image
+
+    @property
+    def tiles(self):
+        return list(
+            get_tile_images(
+                self.image_path, self.image_size, self.size, self.filter_effects
+            )
+        )
 
     @staticmethod
     def _check_if_valid_n_puzzle(image_size, n_puzzle):
@@ -168,34 +304,122 @@ class JigsawEnv(gym.Env):
             return False
         return True
 
-    def _get_obs(self):
-        # Create the observation by assembling the image tiles
-        obs = Image.new("RGB", (self.image_size, self.image_size))
-        draw = ImageDraw.Draw(obs)
-        for i in range(self.size):
-            for j in range(self.size):
-                tile_index = self.board[i, j]
-                tile = self.tiles[tile_index]
-                obs.paste(tile, (j * self.tile_size, i * self.tile_size))
-                x = j * self.tile_size
-                y = i * self.tile_size
-                draw.rectangle(
-                    [x, y, x + self.tile_size, y + self.tile_size],
-                    outline="black",
-                    width=1,
-                )
-        return np.array(obs)
+    @staticmethod
+    def _get_pixel_tile_classes(tile_arrays):
+        # Map every tile index to the first index with identical pixels
+        classes = np.arange(len(tile_arrays))
+        first_index = {}
+        for index, tile in enumerate(tile_arrays):
+            classes[index] = first_index.setdefault(tile.tobytes(), index)
+        return classes
+
+    def _setup_observations(self):
+        # Image observations are painted into a persistent frame buffer, fully on
+        # reset and patched on step, from tiles prepared at the observation size,
+        # see _load_image
+        self._canvas = None
+        self._observation_buffer = None
+        if self.obs_type in ["rgb", "grayscale"]:
+            self._canvas = TileCanvas(
+                self.size,
+                self.size,
+                self.obs_size // self.size,
+                3 if self.obs_type == "rgb" else 1,
+                self.channels_first,
+            )
 
-    def _get_info(self):
-        return {
-            "manhattan_distance": self._manhattan_distance(),
-            "original_image": self.original_image_before_shuffle_or_filter,
-            "goal_image": self.final_image,
-        }
+        shape = observation_shape(
+            self.obs_type,
+            self.size,
+            self.size,
+            self.obs_size // self.size,
+            self.n,
+            self.channels_first,
+        )
+        if self.obs_type == "index":
+            high, dtype = self.n - 1, index_dtype(self.n)
+        else:
+            high, dtype = 1 if self.obs_type == "one_hot" else 255, np.uint8
+        self.observation_space = spaces.Box(low=0, high=high, shape=shape, dtype=dtype)
+
+    def _count_in_place(self, *positions):
+        return sum(
+            int(self._tile_classes[self.board[pos]] == self._goal_classes[pos])
+            for pos in positions
+        )
+
+    def set_observation_buffer(self, buffer: np.ndarray):
+        """Write observations into buffer instead of returning a new array on every step.
+
+        Image observations are then painted straight into buffer, so e.g. a vector
+        environment can give each environment a slice of one shared-memory array and
+        never copy a frame. reset and step return buffer itself, which changes in place.
+
+        Args:
+            buffer (np.ndarray): Writable array with the shape and dtype of the observation space.
+
+        Raises:
+            ValueError: If buffer does not match the observation space.
+        """
+        self._observation_buffer = check_observation_buffer(
+            buffer, self.observation_space
+        )
+        if self._canvas is not None:
+            self._canvas.set_frame(buffer)
+
+    def _get_obs(self):
+        if self._canvas is None:
+            observation = board_observation(
+                self.board, self.obs_type, self.n, self.channels_first
+            )
+            if self._observation_buffer is None:
+                return observation
+            self._observation_buffer[...] = observation
+            return self._observation_buffer
+        if self._observation_buffer is not None:
+            return self._canvas.frame
+        return self._canvas.frame.copy()
+
+    def _get_rgb_frame(self):
+        # Full resolution RGB picture of the board, whatever the observation type
+        frame = self._tile_arrays[self.board].transpose(0, 2, 1, 3, 4)
+        return frame.reshape(self.image_size, self.image_size, 3)
+
+    def _draw_board(self):
+        # Paint every tile of the board into the frame buffer
+        if self._canvas is not None:
+            self._canvas.paint_board(self._obs_tiles, self.board)
+
+    def _draw_tile(self, pos):
+        # Repaint a single board cell in the frame buffer
+        if self._canvas is not None:
+            self._canvas.paint(pos, self._obs_tiles[self.board[pos]])
+
+    def _get_info(self, reset=False):
+        info = {}
+        if "manhattan_distance" in self.info_heuristics:
+            info["manhattan_distance"] = self._manhattan
+        if "misplaced_tiles" in self.info_heuristics:
+            info["misplaced_tiles"] = self._misplaced
+        if "linear_conflict" in self.info_heuristics:
+            info["linear_conflict"] = sum(self._row_conflicts) + sum(
+                self._col_conflicts
+            )
+        if "min_swaps" in self.info_heuristics:
+            info["min_swaps"] = self.n - self._cycles.num_cycles
+        if self.info_images == "always" or (self.info_images == "reset" and reset):
+            info["original_image"] = self.original_image_before_shuffle_or_filter
+            info["goal_image"] = self.final_image
+        return info
 
     def reset(self, *, seed=None, options=None):
         super().reset(seed=seed)
         self.current_time_step = 0
+        if self._prefetcher is not None:
+            # The image sequence restarts from the seed, independently of np_random
+            if seed is not None or not self._prefetcher.seeded:
+                self._prefetcher.seed(seed)
+            self._use_image(*self._prefetcher.next())
         # Initialize the board in solved state
         self.board = np.arange(self.n).reshape((self.size, self.size))
 
@@ -205,8 +429,14 @@ class JigsawEnv(gym.Env):
         # Find the position of the empty tile (0)
         self.empty_pos = np.argwhere(self.board == 0)[0]
 
+        self._draw_board()
+        self._num_in_place = int(
+            np.count_nonzero(self._tile_classes[self.board] == self._goal_classes)
+        )
+        self._reset_heuristics()
+
         observation = self._get_obs()
-        info = self._get_info()
+        info = self._get_info(reset=True)
 
         if self.render_mode == "human":
             self._render_frame()
@@ -224,13 +454,11 @@ class JigsawEnv(gym.Env):
 
         self.current_time_step += 1
 
-        pos_1 = np.array(action[0])
-        pos_2 = np.array(action[1])
-
-        assert pos_1 in self.valid_positions, "Invalid position for position 1."
-        assert pos_2 in self.valid_positions, "Invalid position for position 2."
-
-        self.board[*pos_1], self.board[*pos_2] = self.board[*pos_2], self.board[*pos_1]
+        pos_1, pos_2 = self._decode_action(action)
+        if pos_1 != pos_2:
+            self._swap(pos_1, pos_2)
+            self._draw_tile(pos_1)
+            self._draw_tile(pos_2)
 
         self.terminated = self._is_solved()
 
@@ -248,27 +476,83 @@ class JigsawEnv(gym.Env):
 
         return observation, reward, self.terminated, self.truncated, info
 
+    def _decode_action(self, action):
+        # Turn an action into two (row, col) tuples of Python ints
+        if self.action_type == "flat":
+            assert 0 <= action < self.n * self.n, "Invalid action."
+            cell_1, cell_2 = divmod(int(action), self.n)
+            return divmod(cell_1, self.size), divmod(cell_2, self.size)
+
+        (row_1, col_1), (row_2, col_2) = action
+        pos_1, pos_2 = (int(row_1), int(col_1)), (int(row_2), int(col_2))
+        assert (
+            0 <= pos_1[0] < self.size and 0 <= pos_1[1] < self.size
+        ), "Invalid position for position 1."
+        assert (
+            0 <= pos_2[0] < self.size and 0 <= pos_2[1] < self.size
+        ), "Invalid position for position 2."
+        return pos_1, pos_2
+
     def _is_solved(self):
-        print(f"{np.all(self._get_obs() == np.array(self.final_image))=}")
-        # print(self._get_obs())
-        # print(np.array(self.final_image))
-        # print(self._get_obs()[self._get_obs()!=np.array(self.final_image)])
-        # print(np.array(self.final_image)[self._get_obs()!=np.array(self.final_image)])
-        # from matplotlib import pyplot as plt
-        # plt.imshow(self._get_obs())
-        # plt.show()
-        # plt.imshow(np.array(self.final_image))
-        # plt.show()
-        return np.all(self._get_obs() == np.array(self.final_image))
+        return self._num_in_place == self.n
 
     def _manhattan_distance(self):
-        distance = 0
-        for i in range(self.size):
-            for j in range(self.size):
-                if self.board[i, j] != 0:
-                    x, y = divmod(self.board[i, j] - 1, self.size)
-                    distance += abs(x - i) + abs(y - j)
-        return distance
+        # Jigsaw has no blank, tile 0 is a piece like every other
+        return heuristics.manhattan_distance(self.board, has_blank=False)
+
+    def _reset_heuristics(self):
+        # Compute the enabled heuristics from scratch
+        if "manhattan_distance" in self.info_heuristics:
+            self._manhattan = self._manhattan_distance()
+        if "misplaced_tiles" in self.info_heuristics:
+            self._misplaced = heuristics.misplaced_tiles(self.board, has_blank=False)
+        if "linear_conflict" in self.info_heuristics:
+            self._row_conflicts = [
+                heuristics.row_conflict(self.board, i, has_blank=False)
+                for i in range(self.size)
+            ]
+            self._col_conflicts = [
+                heuristics.column_conflict(self.board, j, has_blank=False)
+                for j in range(self.size)
+            ]
+        if "min_swaps" in self.info_heuristics:
+            self._cycles = heuristics.PermutationCycles(self.board)
+
+    def _update_heuristics(self, positions, sign):
+        # Add (sign=1) or remove (sign=-1) the contribution of the given cells
+        for pos in positions:
+            tile = self.board[pos]
+            if "manhattan_distance" in self.info_heuristics:
+                self._manhattan += sign * heuristics.tile_manhattan_distance(
+                    tile, pos, self.size, has_blank=False
+                )
+            if "misplaced_tiles" in self.info_heuristics:
+                self._misplaced += sign * heuristics.tile_misplaced(
+                    tile, pos, self.size, has_blank=False
+                )
+
+    def _swap(self, pos_1, pos_2):
+        # Swap two board cells and update the incremental statistics
+        self._num_in_place -= self._count_in_place(pos_1, pos_2)
+        self._update_heuristics((pos_1, pos_2), -1)
+        self.board[pos_1], self.board[pos_2] = self.board[pos_2], self.board[pos_1]
+        self._num_in_place += self._count_in_place(pos_1, pos_2)
+        self._update_heuristics((pos_1, pos_2), 1)
+        if "linear_conflict" in self.info_heuristics:
+            for i in {pos_1[0], pos_2[0]}:
+                self._row_conflicts[i] = heuristics.row_conflict(
+                    self.board, i, has_blank=False
+                )
+            for j in {pos_1[1], pos_2[1]}:
+                self._col_conflicts[j] = heuristics.column_conflict(
+                    self.board, j, has_blank=False
+                )
+        if "min_swaps" in self.info_heuristics:
+            self._cycles.swap(
+                self.board,
+                pos_1[0] * self.size + pos_1[1],
+                pos_2[0] * self.size + pos_2[1],
+            )
 
     def render(self):
         if self.render_mode == "ascii":
@@ -287,6 +571,10 @@ class JigsawEnv(gym.Env):
         print()
 
     def _render_frame(self):
+        # Tk is only imported when rendering, so headless processes never load it
+        import tkinter as tk
+        from PIL import ImageTk
+
         if self.window is None:
             self.window = tk.Tk()
             self.window.title("n-Puzzle")
@@ -295,13 +583,48 @@ class JigsawEnv(gym.Env):
             )
             self.canvas.pack()
 
-        img = Image.fromarray(self._get_obs())
+        img = Image.fromarray(self._get_rgb_frame())
         self.photo = ImageTk.PhotoImage(img)
         self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo)  # type: ignore
         self.window.update()
 
+    def enable_timing(self, callback=None):
+        """Time the phases of step and reset listed in TIMED_PHASES.
+
+        Until this is called the environment runs no timing code at all.
+
+        Args:
+            callback (Callable, optional): Called as callback(phase, seconds) after every
+                timed call. It is pickled with the environment, so pickling a timed
+                environment needs a picklable callback. Defaults to None.
+
+        Returns:
+            timing.PhaseTimer: The timer collecting the durations, see timing_stats.
+        """
+        self._timer = timing.PhaseTimer(callback)
+        timing.enable_timing(self, self.TIMED_PHASES, self._timer)
+        return self._timer
+
+    def disable_timing(self):
+        timing.disable_timing(self, self.TIMED_PHASES)
+        self._timer = None
+
+    def __getstate__(self):
+        # The timed wrappers cannot be pickled, they are installed again from _timer
+        return timing.without_timing(self.__dict__, self.TIMED_PHASES)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._timer is not None:
+            timing.enable_timing(self, self.TIMED_PHASES, self._timer)
+
+    def timing_stats(self):
+        """Return the count, total, mean, percentiles and max duration of every timed phase."""
+        return self._timer.stats() if self._timer is not None else {}
+
     def close(self):
-        pass
+        if self._prefetcher is not None:
+            self._prefetcher.close()
         # if self.window is not None:
         #     self.window.destroy()
         #     self.window = None
@@ -0,0 +1,229 @@
+import numpy as np
+from gymnasium.experimental.vector import VectorEnv
+from gymnasium.vector.utils import batch_space
+from typing import Optional
+
+from .n_puzzle import n_PuzzleEnv
+from .scramble import SCRAMBLES, make_solvable, random_walk_boards
+
+
+class n_PuzzleVectorEnv(VectorEnv):
+    metadata = {"render_modes": [], "autoreset": True}
+
+    def __init__(
+        self,
+        num_envs: int = 1,
+        image_path: Optional[str] = None,
+        n_puzzle: int = 15,
+        image_size: int = 240,
+        filter_effects: Optional[str] = None,
+        time_steps_limit: Optional[int] = None,
+        max_episode_steps: Optional[int] = None,
+        scramble: str = "shuffle",
+        scramble_moves: int = 20,
+        copy: bool = True,
+    ):
+        """Initialize a batch of n-Puzzle environments that are stepped together.
+
+        All boards live in a single (num_envs, size, size) integer array and a batch
+        of actions is applied with vectorized NumPy operations. Observations are
+        painted into one preallocated (num_envs, image_size, image_size, 3) buffer,
+        repainting only the two cells that changed on each board.
+
+        Args:
+            num_envs (int): Number of puzzles in the batch. Defaults to 1.
+            image_path (str, optional): Path to the image file to be used for the puzzles.
+                Defaults to the bundled example image.
+            n_puzzle (int): Number of tiles in each puzzle (e.g., 15 for 15-Puzzle).
+                Defaults to 15.
+            image_size (int): Size of the resized image in pixels. Defaults to 240.
+            filter_effects (str, optional): Filter effect applied to the image, see n_PuzzleEnv.
+                Defaults to None.
+            time_steps_limit (int, optional): Maximum number of time steps for each episode. If None, there is no limit.
+                Defaults to None.
+            max_episode_steps (int, optional): Used as the time steps limit when time_steps_limit is None,
+                as passed by gymnasium.make_vec. Defaults to None.
+            scramble (str): How boards are scrambled on reset and autoreset, see n_PuzzleEnv.
+                Defaults to "shuffle".
+            scramble_moves (int): Number of moves for the "random_walk" scramble, 0 for solved
+                boards. Defaults to 20.
+            copy (bool): If True, reset and step return a copy of the observation buffer.
+                Defaults to True.
+
+        Note:
+            Actions are the same as for n_PuzzleEnv (0: move up, 1: move right, 2: move down,
+            3: move left), one per puzzle. Puzzles that terminate or get truncated are reset
+            automatically; their last observation and info are returned in info["final_observation"]
+            and info["final_info"]. A "scramble" or "scramble_moves" passed in
+            reset(options=...) also applies to these autoresets, until the next reset.
+        """
+
+        super(n_PuzzleVectorEnv, self).__init__()
+
+        # A single environment provides the preprocessed tiles and the spaces
+        self._template = n_PuzzleEnv(
+            image_path=image_path,
+            n_puzzle=n_puzzle,
+            image_size=image_size,
+            filter_effects=filter_effects,
+        )
+        self.num_envs = num_envs
+        self.size = self._template.size
+        self.n = self._template.n
+        self.image_size = image_size
+        self.tile_size = self._template.tile_size
+        self._tile_arrays = self._template._tile_arrays
+        self.copy = copy
+
+        assert scramble in SCRAMBLES, "Invalid scramble."
+        self.scramble = scramble
+        self.scramble_moves = scramble_moves
+        # Scramble of the current episodes, chosen on reset and kept for autoresets
+        self._episode_scramble = scramble
+        self._episode_scramble_moves = scramble_moves
+
+        if time_steps_limit is None:
+            time_steps_limit = max_episode_steps
+        self.time_steps_limit = time_steps_limit if time_steps_limit else np.inf
+
+        self.single_action_space = self._template.action_space
+        self.single_observation_space = self._template.observation_space
+        self.action_space = batch_space(self.single_action_space, num_envs)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+
+        self.boards = np.zeros((num_envs, self.size, self.size), dtype=np.int32)
+        self.empty_pos = np.zeros(num_envs, dtype=np.int32)  # flat index of tile 0
+        self.current_time_step = np.zeros(num_envs, dtype=np.int64)
+        self._num_in_place = np.zeros(num_envs, dtype=np.int32)
+        self._manhattan = np.zeros(num_envs, dtype=np.int32)
+        self._observations = np.zeros(
+            (num_envs, image_size, image_size, 3), dtype=np.uint8
+        )
+
+        # Row and column offsets for up, right, down, left
+        self._dy = np.array([-1, 0, 1, 0])
+        self._dx = np.array([0, 1, 0, -1])
+
+    def _reset_boards(self, env_ids):
+        # Scramble the selected boards and recompute their derived state
+        k = len(env_ids)
+        if self._episode_scramble == "random_walk":
+            boards = random_walk_boards(
+                k, self.size, self._episode_scramble_moves, self.np_random
+            )
+            boards = boards.reshape(k, self.n)
+        else:
+            boards = self.np_random.permuted(
+                np.tile(np.arange(self.n, dtype=np.int32), (k, 1)), axis=1
+            )
+            if self._episode_scramble == "solvable":
+                make_solvable(boards.reshape(k, self.size, self.size))
+        self.boards.reshape(self.num_envs, self.n)[env_ids] = boards
+        self.empty_pos[env_ids] = np.argmin(boards, axis=1)
+        self.current_time_step[env_ids] = 0
+
+        goal = np.arange(self.n)
+        self._num_in_place[env_ids] = np.count_nonzero(boards == goal, axis=1)
+        self._manhattan[env_ids] = np.where(
+            boards != 0, self._tile_distance(boards, goal), 0
+        ).sum(axis=1)
+
+        # Paint every tile of the selected boards
+        frames = self._observations.reshape(
+            self.num_envs, self.size, self.tile_size, self.size, self.tile_size, 3
+        )
+        frames[env_ids] = self._tile_arrays[self.boards[env_ids]].transpose(
+            0, 1, 3, 2, 4, 5
+        )
+
+    def _tile_distance(self, tiles, positions):
+        # Manhattan distance of tiles at flat positions to their goal cells
+        return np.abs(tiles // self.size - positions // self.size) + np.abs(
+            tiles % self.size - positions % self.size
+        )
+
+    def _draw_tiles(self, env_ids, positions):
+        # Repaint one cell (given as flat position) for each selected board
+        frames = self._observations.reshape(
+            self.num_envs, self.size, self.tile_size, self.size, self.tile_size, 3
+        )
+        i, j = np.divmod(positions, self.size)
+        tiles = self.boards.reshape(self.num_envs, self.n)[env_ids, positions]
+        frames[env_ids, i, :, j] = self._tile_arrays[tiles]
+
+    def _get_obs(self):
+        return self._observations.copy() if self.copy else self._observations
+
+    def _get_info(self):
+        return {
+            "manhattan_distance": self._manhattan.copy(),
+            "_manhattan_distance": np.ones(self.num_envs, dtype=bool),
+        }
+
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed)
+        options = options or {}
+        scramble = options.get("scramble", self.scramble)
+        assert scramble in SCRAMBLES, "Invalid scramble."
+        self._episode_scramble = scramble
+        self._episode_scramble_moves = options.get(
+            "scramble_moves", self.scramble_moves
+        )
+        self._reset_boards(np.arange(self.num_envs))
+        return self._get_obs(), self._get_info()
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        self.current_time_step += 1
+
+        i, j = np.divmod(self.empty_pos, self.size)
+        new_i = i + self._dy[actions]
+        new_j = j + self._dx[actions]
+        valid = (new_i >= 0) & (new_i < self.size) & (new_j >= 0) & (new_j < self.size)
+
+        # Swap the empty tile with the adjacent tile on every board with a valid move
+        env_ids = np.flatnonzero(valid)
+        empty_pos = self.empty_pos[env_ids]
+        new_pos = (new_i * self.size + new_j)[env_ids]
+        flat_boards = self.boards.reshape(self.num_envs, self.n)
+        tiles = flat_boards[env_ids, new_pos]
+
+        self._num_in_place[env_ids] += (
+            (tiles == empty_pos).astype(np.int32)
+            - (tiles == new_pos)
+            + (new_pos == 0)
+            - (empty_pos == 0)
+        )
+        self._manhattan[env_ids] += self._tile_distance(
+            tiles, empty_pos
+        ) - self._tile_distance(tiles, new_pos)
+
+        flat_boards[env_ids, empty_pos] = tiles
+        flat_boards[env_ids, new_pos] = 0
+        self.empty_pos[env_ids] = new_pos
+        self._draw_tiles(env_ids, empty_pos)
+        self._draw_tiles(env_ids, new_pos)
+
+        terminated = self._num_in_place == self.n
+        truncated = self.current_time_step >= self.time_steps_limit
+        reward = np.full(self.num_envs, -1.0)
+
+        # Keep the final step of finished puzzles and reset them
+        done = terminated | truncated
+        final_observation = np.full(self.num_envs, None, dtype=object)
+        final_info = np.full(self.num_envs, None, dtype=object)
+        for env_id in np.flatnonzero(done):
+            final_observation[env_id] = self._observations[env_id].copy()
+            final_info[env_id] = {"manhattan_distance": int(self._manhattan[env_id])}
+        if done.any():
+            self._reset_boards(np.flatnonzero(done))
+
+        observation = self._get_obs()
+        info = self._get_info()
+        if done.any():
+            info["final_observation"] = final_observation
+            info["_final_observation"] = done
+            info["final_info"] = final_info
+            info["_final_info"] = done
+
+        return observation, reward, terminated, truncated, info
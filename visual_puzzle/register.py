@@ -5,11 +5,13 @@ def register_environments():
     register(
         id="n_Puzzle-v0",
         entry_point="visual_puzzle.n_puzzle:n_PuzzleEnv",
+        vector_entry_point="visual_puzzle.n_puzzle_vector:n_PuzzleVectorEnv",
     )
 
     register(
         id="RushHour-v0",
         entry_point="visual_puzzle.rush_hour:RushHourEnv",
+        vector_entry_point="visual_puzzle.rush_hour_vector:RushHourVectorEnv",
     )
 
     register(
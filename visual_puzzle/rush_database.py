@@ -0,0 +1,131 @@
+import hashlib
+import os
+import zipfile
+from typing import Optional
+
+import numpy as np
+
+from . import get_asset_path, get_cache_path
+
+# Fixed-width index record: optimal number of moves and the 36-character board
+RECORD_DTYPE = np.dtype([("length", np.uint8), ("board", "S36")])
+
+
+class RushHourDatabase:
+    def __init__(self, rush_txt_path: Optional[str] = None):
+        """Indexed, memory-mapped view of a rush.txt puzzle database.
+
+        The first time a rush.txt file (or its zipped form, rush.txt.zip) is used, its
+        lines are converted into a binary index of fixed-width records sorted by length,
+        stored in the cache directory (see visual_puzzle.get_cache_path). The index is
+        memory-mapped, so every process opening it shares the same pages, and a board
+        is read without loading the whole file.
+
+        Parameters:
+        -----------
+        rush_txt_path : str, Optional
+            The path to the rush.txt file, where each line is "length board cluster_size".
+            If the file does not exist, "<rush_txt_path>.zip" is used instead.
+            If None, the bundled rush.txt is used.
+
+        Attributes:
+        -----------
+        records : numpy.ndarray
+            The memory-mapped records with fields "length" and "board", sorted by length.
+        """
+        if rush_txt_path is None:
+            rush_txt_path = get_asset_path("rush.txt")
+        if not os.path.exists(rush_txt_path) and os.path.exists(rush_txt_path + ".zip"):
+            rush_txt_path = rush_txt_path + ".zip"
+        self.rush_txt_path = rush_txt_path
+
+        # The index is keyed by the source file, so edited files get a new index
+        stat = os.stat(rush_txt_path)
+        key = f"{os.path.abspath(rush_txt_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        index_path = get_cache_path(f"rush_index_{digest}.npy")
+        if not os.path.exists(index_path):
+            self._build_index(rush_txt_path, index_path)
+
+        self.records = np.load(index_path, mmap_mode="r")
+        # Records with length l are records[self._offsets[l] : self._offsets[l + 1]]
+        self._offsets = np.searchsorted(
+            self.records["length"], np.arange(257), side="left"
+        )
+
+    @staticmethod
+    def _build_index(rush_txt_path, index_path):
+        lengths, boards = [], []
+        if rush_txt_path.endswith(".zip"):
+            with zipfile.ZipFile(rush_txt_path) as archive:
+                name = next(n for n in archive.namelist() if n.endswith(".txt"))
+                with archive.open(name) as f:
+                    for line in f:
+                        length, board = line.split()[:2]
+                        lengths.append(int(length))
+                        boards.append(board)
+        else:
+            with open(rush_txt_path, "rb") as f:
+                for line in f:
+                    length, board = line.split()[:2]
+                    lengths.append(int(length))
+                    boards.append(board)
+
+        records = np.empty(len(lengths), dtype=RECORD_DTYPE)
+        records["length"] = lengths
+        records["board"] = boards
+        records = records[np.argsort(records["length"], kind="stable")]
+
+        # Write to a temporary file first so concurrent builders never see partial files
+        temporary_path = f"{index_path}.{os.getpid()}.tmp.npy"
+        np.save(temporary_path, records)
+        os.replace(temporary_path, index_path)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        record = self.records[index]
+        return int(record["length"]), record["board"].decode()
+
+    def index_range(self, min_length=None, max_length=None):
+        """Return the (start, stop) range of record indices with a length in the given bounds."""
+        # Lengths are stored as uint8, so bounds outside [0, 255] are clipped
+        start, stop = 0, len(self)
+        if min_length is not None:
+            start = self._offsets[min(max(min_length, 0), 256)]
+        if max_length is not None:
+            stop = self._offsets[min(max(max_length + 1, 0), 256)]
+        return int(start), int(max(start, stop))
+
+    def sample(self, rng=None, min_length=None, max_length=None):
+        """Draw a random board, optionally restricted to a range of lengths.
+
+        Parameters:
+        -----------
+        rng : numpy.random.Generator, Optional
+            The random number generator to use. If None, numpy.random is used.
+        min_length, max_length : int, Optional
+            Inclusive bounds on the optimal number of moves.
+
+        Returns:
+        --------
+        tuple
+            (length, board_description)
+        """
+        start, stop = self.index_range(min_length, max_length)
+        if start == stop:
+            raise ValueError("No boards with a length in the given range.")
+        if rng is None:
+            return self[np.random.randint(start, stop)]
+        return self[int(rng.integers(start, stop))]
+
+
+_databases = {}
+
+
+def get_database(rush_txt_path: Optional[str] = None):
+    """Return the RushHourDatabase for a path, opened once per process."""
+    if rush_txt_path not in _databases:
+        _databases[rush_txt_path] = RushHourDatabase(rush_txt_path)
+    return _databases[rush_txt_path]
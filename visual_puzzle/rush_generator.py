@@ -0,0 +1,267 @@
+"""Generate random Rush Hour puzzles in a range of difficulty.
+
+Usage:
+    visual-puzzle-rush-gen --out held_out.txt --count 1000 --min-length 20 \\
+        --max-length 40 --walls 1 --exclude visual_puzzle/assets/rush.txt
+
+Random boards are sampled (the red car "A" on the exit row, then cars and
+trucks at random free places, and up to --walls walls). For every board the
+whole cluster of boards reachable from it is explored, and a breadth-first
+search backward from its solved boards gives every board its optimal number of
+moves. The hardest board of each solvable cluster is kept if its length is in
+[--min-length, --max-length]. Boards are compared in a canonical form (pieces
+relabeled by first appearance), so every cluster is written at most once, and
+clusters that contain a board of an --exclude file are skipped.
+
+The output has the rush.txt format read by RushHourEnv(rush_txt_path=...),
+one "length board cluster_size" line per puzzle, sorted by decreasing length.
+Lengths count slides of any number of cells as one move, like rush.txt, unless
+--metric step counts single-cell steps, like RushHourEnv.step.
+"""
+
+import argparse
+import os
+import string
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .solvers.rush_hour import RushHourSolver
+
+METRICS = ["slide", "step"]
+
+# Canonical boards of the --exclude files, set in every worker by _init_worker
+_excluded = frozenset()
+
+
+def canonical_board(board_description):
+    """Relabel the pieces of a board in order of first appearance, keeping "A" for the red car."""
+    labels = {"o": "o", "x": "x", "A": "A"}
+    letters = iter(string.ascii_uppercase[1:])
+    for symbol in board_description:
+        if symbol not in labels:
+            labels[symbol] = next(letters)
+    return "".join(labels[symbol] for symbol in board_description)
+
+
+def random_board(rng, num_pieces, num_walls=0):
+    """Sample a board with the red car on the exit row, num_pieces other pieces and num_walls walls.
+
+    Pieces are cars (2 cells) or trucks (3 cells) placed at random free places;
+    the board has fewer pieces when no free place is found. Horizontal pieces
+    on the exit row are only placed left of the red car (right of it they could
+    never let it out), and walls never are.
+    """
+    cells = ["o"] * 36
+    column = int(rng.integers(0, 4))
+    cells[12 + column] = cells[13 + column] = "A"
+
+    free_cells = [i for i in range(36) if cells[i] == "o" and i // 6 != 2]
+    for i in rng.permutation(free_cells)[:num_walls]:
+        cells[i] = "x"
+
+    letters = iter(string.ascii_uppercase[1:])
+    placed, attempts = 0, 0
+    while placed < num_pieces and attempts < 100 * num_pieces:
+        attempts += 1
+        length = 3 if rng.random() < 0.25 else 2
+        horizontal = rng.random() < 0.5
+        row = int(rng.integers(0, 6 if horizontal else 7 - length))
+        col = int(rng.integers(0, 7 - length if horizontal else 6))
+        if horizontal and row == 2 and col + length > column:
+            continue
+        step = 1 if horizontal else 6
+        piece_cells = [row * 6 + col + k * step for k in range(length)]
+        if all(cells[i] == "o" for i in piece_cells):
+            letter = next(letters)
+            for i in piece_cells:
+                cells[i] = letter
+            placed += 1
+    return "".join(cells)
+
+
+def analyse_cluster(
+    board_description, metric="slide", max_states=None, excluded=frozenset()
+):
+    """Find the hardest board of the cluster a board belongs to.
+
+    Args:
+        board_description (str): A 36-character board.
+        metric (str): "slide" to count slides of any length as one move (rush.txt),
+            "step" to count single-cell steps (RushHourEnv). Defaults to "slide".
+        max_states (int, optional): Give up on clusters with more boards. Defaults to None.
+        excluded (frozenset): Canonical boards whose clusters are skipped. Both metrics
+            give the same clusters, so this works with boards of either. Defaults to
+            an empty set.
+
+    Returns:
+        tuple or None: (length, hardest boards, cluster size), the hardest boards being
+            the canonical forms of every board at the largest optimal length, sorted.
+            None if the cluster has no solved board, is too large, or contains any
+            excluded board.
+    """
+    solver = RushHourSolver(board_description)
+    if metric == "slide":
+        neighbours = solver.slides
+    else:
+        neighbours = lambda state: (s for _, s in solver.neighbours(state))
+
+    # Every move can be undone, so the cluster is what a search from the board reaches
+    states = {solver.start}
+    queue = deque([solver.start])
+    while queue:
+        for next_state in neighbours(queue.popleft()):
+            if next_state not in states:
+                states.add(next_state)
+                queue.append(next_state)
+                if max_states is not None and len(states) > max_states:
+                    return None
+
+    # Breadth-first search backward from every solved board
+    frontier = [state for state in states if solver.is_solved(state)]
+    if not frontier:
+        return None
+    if excluded and any(
+        canonical_board(solver.board(state)) in excluded for state in states
+    ):
+        return None
+    distances = dict.fromkeys(frontier, 0)
+    length = 0
+    while True:
+        next_frontier = []
+        for state in frontier:
+            for next_state in neighbours(state):
+                if next_state not in distances:
+                    distances[next_state] = length + 1
+                    next_frontier.append(next_state)
+        if not next_frontier:
+            break
+        frontier = next_frontier
+        length += 1
+
+    hardest = sorted(canonical_board(solver.board(state)) for state in frontier)
+    return length, hardest, len(states)
+
+
+def _init_worker(excluded):
+    global _excluded
+    _excluded = excluded
+
+
+def generate_puzzles(seed, config):
+    """Sample config["attempts"] boards and return the puzzles in the difficulty range.
+
+    Returns:
+        list: (length, board, cluster_size) of every puzzle found, board being canonical.
+    """
+    rng = np.random.default_rng(seed)
+    puzzles = []
+    for _ in range(config["attempts"]):
+        num_pieces = int(rng.integers(config["min_pieces"], config["max_pieces"] + 1))
+        board = random_board(rng, num_pieces, int(rng.integers(0, config["walls"] + 1)))
+        result = analyse_cluster(
+            board, config["metric"], config["max_states"], _excluded
+        )
+        if result is None:
+            continue
+        length, hardest, cluster_size = result
+        if not config["min_length"] <= length <= config["max_length"]:
+            continue
+        puzzles.append((length, hardest[0], cluster_size))
+    return puzzles
+
+
+def read_boards(path):
+    """Return the canonical boards of a rush.txt file."""
+    with open(path) as f:
+        return {canonical_board(line.split()[1]) for line in f if line.strip()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="visual-puzzle-rush-gen",
+        description=__doc__.splitlines()[0],
+        epilog=__doc__.split("\n\n", 2)[2],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--out", required=True, help="Output file.")
+    parser.add_argument("--count", type=int, required=True, help="Number of puzzles.")
+    parser.add_argument("--min-length", type=int, default=1)
+    parser.add_argument("--max-length", type=int, default=255)
+    parser.add_argument("--metric", choices=METRICS, default="slide")
+    parser.add_argument("--min-pieces", type=int, default=6)
+    parser.add_argument("--max-pieces", type=int, default=13)
+    parser.add_argument("--walls", type=int, default=0, help="Most walls per board.")
+    parser.add_argument(
+        "--exclude", nargs="*", default=[], help="rush.txt files of boards to skip."
+    )
+    parser.add_argument(
+        "--max-states",
+        type=int,
+        default=200000,
+        help="Skip clusters with more boards.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--attempts", type=int, default=100, help="Boards sampled per task."
+    )
+    parser.add_argument(
+        "--max-tasks", type=int, default=100000, help="Give up after this many tasks."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(), help="Worker processes."
+    )
+    args = parser.parse_args(argv)
+
+    config = {
+        "attempts": args.attempts,
+        "min_pieces": args.min_pieces,
+        "max_pieces": args.max_pieces,
+        "walls": args.walls,
+        "metric": args.metric,
+        "max_states": args.max_states,
+        "min_length": args.min_length,
+        "max_length": args.max_length,
+    }
+    excluded = frozenset().union(*(read_boards(path) for path in args.exclude))
+
+    # Task i samples with seed --seed + i, and results are used in task order, so
+    # the output only depends on the arguments
+    puzzles = {}
+    with ProcessPoolExecutor(
+        max_workers=args.workers, initializer=_init_worker, initargs=(excluded,)
+    ) as executor:
+        pending = deque()
+        task = 0
+        while len(puzzles) < args.count and (pending or task < args.max_tasks):
+            while len(pending) < 2 * args.workers and task < args.max_tasks:
+                pending.append(
+                    executor.submit(generate_puzzles, args.seed + task, config)
+                )
+                task += 1
+            for length, board, cluster_size in pending.popleft().result():
+                if board not in puzzles and len(puzzles) < args.count:
+                    puzzles[board] = (length, cluster_size)
+            print(f"{len(puzzles)}/{args.count} puzzles.", flush=True)
+        for future in pending:
+            future.cancel()
+
+    # Write to a temporary file first so the output is always complete
+    lines = sorted(
+        (-length, board, cluster_size)
+        for board, (length, cluster_size) in puzzles.items()
+    )
+    temporary_path = f"{args.out}.{os.getpid()}.tmp"
+    with open(temporary_path, "w") as f:
+        for length, board, cluster_size in lines:
+            f.write(f"{-length} {board} {cluster_size}\n")
+    os.replace(temporary_path, args.out)
+
+    if len(puzzles) < args.count:
+        sys.exit(f"Only found {len(puzzles)} puzzles in {args.max_tasks} tasks.")
+
+
+if __name__ == "__main__":
+    main()
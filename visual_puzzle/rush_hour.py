@@ -2,15 +2,35 @@ import gymnasium as gym
 import numpy as np
 from gymnasium import spaces
 from PIL import Image, ImageDraw
-from matplotlib import pyplot as plt
-from typing import Optional
+from typing import Optional, Sequence
 
-from . import get_asset_path
+from . import get_asset_path, timing
+from .rush_database import get_database
+from .tiles import (
+    OBS_TYPES,
+    TileCanvas,
+    board_observation,
+    check_observation_buffer,
+    observation_shape,
+)
 import os
+import string
 
 
 class RushHourEnv(gym.Env):
     metadata = {"render_modes": ["human"], "render_fps": 1}
+    # Phases timed by enable_timing, mapped to the methods they time. The cells a
+    # move changes are drawn inside the move, so "draw" is part of "move".
+    TIMED_PHASES = {
+        "step": "step",
+        "reset": "reset",
+        "move": "_move_piece",
+        "draw": "_draw_cell",
+        "is_solved": "_check_win",
+        "get_obs": "_get_obs",
+        "render": "render",
+        "draw_board": "_draw_board",
+    }
 
     def __init__(
         self,
@@ -18,6 +38,12 @@ class RushHourEnv(gym.Env):
         obs_type: Optional[str] = None,
         rush_txt_path: Optional[str] = None,
         render_mode: Optional[str] = None,
+        board_pool: Optional[Sequence[str]] = None,
+        resample_on_reset: bool = False,
+        max_pieces: Optional[int] = None,
+        cell_size: int = 50,
+        channels_first: bool = False,
+        color_seed: Optional[int] = None,
     ):
         """
         Initialize the Rush Hour environment.
@@ -35,7 +61,10 @@ class RushHourEnv(gym.Env):
             If None, a random board will be loaded from rush.txt (which should be located at rush_txt_path) file.
 
         obs_type : str, Optional
-            The type of observation to return. Must be either 'rgb'. 'text' only for debugging.
+            The type of observation to return. Must be either 'rgb', 'grayscale' (a single
+            channel image), 'index' (a 6x6 uint8 board where 0 is empty, 1 is a wall and
+            2 + k is the piece self.pieces[k]) or 'one_hot' (the one-hot encoding of 'index'
+            with max_pieces + 2 channels). 'text' only for debugging.
             Default is 'rgb'.
 
         rush_txt_path : str, Optional
@@ -47,6 +76,42 @@ class RushHourEnv(gym.Env):
             If None, no rendering will be done.
             Default is None.
 
+        board_pool : Sequence[str], Optional
+            An in-memory pool of board descriptions to draw boards from. If None, boards
+            are drawn from rush.txt.
+            Default is None.
+
+        resample_on_reset : bool, Optional
+            If True, every reset draws a new random board from the pool (or rush.txt) using
+            the env's seeded random number generator. Boards can also be chosen per reset
+            with reset(options=...), see reset.
+            Default is False.
+
+        max_pieces : int, Optional
+            The number of pieces the action space is sized for, so that it keeps its shape
+            when the board changes on reset. Actions for piece indices the current board
+            does not have leave the board unchanged. If None, the number of pieces of the
+            initial board, or 18 (the most a 6x6 board can hold) when resample_on_reset is
+            True or a board_pool is given.
+            Default is None.
+
+        cell_size : int, Optional
+            The width and height of a board cell in pixels for 'rgb' and 'grayscale'
+            observations. Cells are drawn at this size, so small observations need no resizing.
+            Default is 50.
+
+        channels_first : bool, Optional
+            If True, 'rgb', 'grayscale' and 'one_hot' observations are laid out as
+            (channels, height, width) instead of (height, width, channels).
+            Default is False.
+
+        color_seed : int, Optional
+            If given, the colors of the pieces 'B' to 'Z' are drawn from a generator seeded
+            with it, so every environment with the same color_seed renders the same pixels
+            whatever boards it played before. If None, colors are drawn from numpy.random
+            when a piece is first seen.
+            Default is None.
+
         Attributes:
         -----------
         board : numpy.ndarray
@@ -65,7 +130,7 @@ class RushHourEnv(gym.Env):
         Raises:
         -------
         AssertionError
-            If the obs_type is not 'rgb' or 'text'.
+            If the obs_type is not 'rgb', 'grayscale', 'index', 'one_hot' or 'text'.
 
         Notes:
         ------
@@ -80,59 +145,125 @@ class RushHourEnv(gym.Env):
         if obs_type is None:
             obs_type = "rgb"
 
-        assert obs_type in ["rgb", "text"], "Observation type must be 'rgb' or 'text'"
+        assert obs_type in OBS_TYPES + [
+            "text"
+        ], "Observation type must be 'rgb', 'grayscale', 'index', 'one_hot' or 'text'"
+        self.rush_txt_path = rush_txt_path
+        self.board_pool = list(board_pool) if board_pool is not None else None
+        self.resample_on_reset = resample_on_reset
+
         if board_description is not None:
-            self.board_description = board_description
-            self.num_steps_to_finish = None
+            num_steps_to_finish = None
+        elif self.board_pool is not None:
+            num_steps_to_finish = None
+            board_description = self.board_pool[np.random.randint(len(self.board_pool))]
         else:
             if rush_txt_path is not None:
 
-                self.num_steps_to_finish, self.board_description = (
-                    self.load_board_randomly(rush_txt_path)
+                num_steps_to_finish, board_description = self.load_board_randomly(
+                    rush_txt_path
                 )
             else:
-                self.num_steps_to_finish, self.board_description = (
-                    self.load_board_randomly(get_asset_path("rush.txt"))
+                num_steps_to_finish, board_description = self.load_board_randomly(
+                    get_asset_path("rush.txt")
                 )
 
-        self.board = np.array(list(self.board_description)).reshape(6, 6)
-        self.pieces = set(self.board.flatten()) - set("ox")
-        self.pieces = sorted(list(self.pieces))
-        self.piece_orientations = self._get_piece_orientations()
+        # Define colors for pieces
+        self.colors = {
+            "o": (255, 255, 255),  # White for empty spaces
+            "x": (0, 0, 0),  # Black for walls
+            "A": (255, 0, 0),  # Red for the main car
+        }
+        if color_seed is not None:
+            color_rng = np.random.default_rng(color_seed)
+            for piece in string.ascii_uppercase[1:]:
+                self.colors[piece] = tuple(color_rng.integers(0, 256, 3))
+        self._set_board(board_description, num_steps_to_finish)
+
         self.obs_type = obs_type
-        self.cell_size = 50
+        self.cell_size = cell_size
+        self.channels_first = channels_first
         self.render_mode = render_mode
         # print(self.pieces)
 
+        if max_pieces is None:
+            if resample_on_reset or self.board_pool is not None:
+                max_pieces = 18
+            else:
+                max_pieces = len(self.pieces)
+        self.max_pieces = max_pieces
+
         # piece description, direction: 0 - up, 1 - right, 2 - down, 3 - left
-        self.action_space = spaces.MultiDiscrete(np.array([len(self.pieces), 4]))
+        self.action_space = spaces.MultiDiscrete(np.array([self.max_pieces, 4]))
 
         # Define observation space
+        num_classes = self.max_pieces + 2
+        shape = observation_shape(
+            "rgb" if obs_type == "text" else obs_type,
+            6,
+            6,
+            self.cell_size,
+            num_classes,
+            channels_first,
+        )
+        if obs_type == "index":
+            high = num_classes - 1
+        else:
+            high = 1 if obs_type == "one_hot" else 255
         self.observation_space = spaces.Box(
-            low=0,
-            high=255,
-            shape=(6 * self.cell_size, 6 * self.cell_size, 3),
-            dtype=np.uint8,
+            low=0, high=high, shape=shape, dtype=np.uint8
         )
 
-        # Define colors for pieces
-        self.colors = {
-            "o": (255, 255, 255),  # White for empty spaces
-            "x": (0, 0, 0),  # Black for walls
-            "A": (255, 0, 0),  # Red for the main car
-        }
+        # Image observations are painted into a frame buffer from prerendered cells
+        # keyed by (board symbol, label), see _get_sprite
+        self._sprites = {}
+        self._canvas = None
+        self._observation_buffer = None
+        self._timer = None
+        if obs_type in ["rgb", "grayscale"]:
+            channels = 3 if obs_type == "rgb" else 1
+            self._canvas = TileCanvas(6, 6, cell_size, channels, channels_first)
+        self._draw_board()
+
+    def _set_board(self, board_description, num_steps_to_finish):
+        # Switch to a new board, recomputing everything that depends on its pieces
+        self.board_description = board_description
+        self.num_steps_to_finish = num_steps_to_finish
+        self.board = np.array(list(self.board_description)).reshape(6, 6)
+        self.pieces = set(self.board.flatten()) - set("ox")
+        self.pieces = sorted(list(self.pieces))
+        self.piece_orientations = self._get_piece_orientations()
+        self._piece_index = {piece: index for index, piece in enumerate(self.pieces)}
+        self._init_piece_tables()
+
         # Generate random colors for other pieces
         for piece in self.pieces:
             if piece not in self.colors:
                 self.colors[piece] = tuple(np.random.randint(0, 256, 3))
 
+    def _choose_board(self, options):
+        # Pick the (length, board) to play from the reset options
+        if "board_description" in options:
+            return None, options["board_description"]
+
+        if self.board_pool is not None:
+            if "min_length" in options or "max_length" in options:
+                raise ValueError("Difficulty ranges need boards from rush.txt.")
+            if "board_index" in options:
+                return None, self.board_pool[options["board_index"]]
+            return None, self.board_pool[self.np_random.integers(len(self.board_pool))]
+
+        database = get_database(self.rush_txt_path)
+        if "board_index" in options:
+            return database[options["board_index"]]
+        return database.sample(
+            self.np_random, options.get("min_length"), options.get("max_length")
+        )
+
     # Load a board from rush.txt file were each sentence is shortest_path, board, id
     def load_board_randomly(self, file_path: str):
-        with open(file_path, "r") as f:
-            lines = f.readlines()
-            random_board = lines[np.random.randint(0, len(lines))].split(" ")
-            # print(random_board)
-            return int(random_board[0]), random_board[1]
+        # The memory-mapped index is built once and shared by every env and process
+        return get_database(file_path).sample()
 
     def _get_piece_orientations(self):
         orientations = {}
@@ -144,17 +275,107 @@ class RushHourEnv(gym.Env):
                 orientations[piece] = "V"  # Vertical
         return orientations
 
+    def _init_piece_tables(self):
+        # Per-piece state indexed like self.pieces: anchor (topmost/leftmost cell),
+        # length and orientation, so moves never have to scan the board
+        num_pieces = len(self.pieces)
+        self._piece_rows = np.zeros(num_pieces, dtype=np.int64)
+        self._piece_cols = np.zeros(num_pieces, dtype=np.int64)
+        self._piece_lengths = np.zeros(num_pieces, dtype=np.int64)
+        self._piece_horizontal = np.zeros(num_pieces, dtype=bool)
+        # Board of class indices for 'index' observations: 0 empty, 1 wall, 2 + piece
+        self._index_board = (self.board == "x").astype(np.uint8)
+        for index, piece in enumerate(self.pieces):
+            positions = np.argwhere(self.board == piece)
+            self._piece_rows[index], self._piece_cols[index] = positions[0]
+            self._piece_lengths[index] = len(positions)
+            self._piece_horizontal[index] = self.piece_orientations[piece] == "H"
+            self._index_board[self.board == piece] = index + 2
+
+    def action_mask(self):
+        """Return which actions move a piece.
+
+        Returns:
+        --------
+        numpy.ndarray
+            A boolean array of shape (max_pieces, 4), True where action [piece, direction]
+            moves the piece by one cell. Flatten it for algorithms that mask a
+            Discrete(max_pieces * 4) action space.
+        """
+        rows, cols = self._piece_rows, self._piece_cols
+        lengths, horizontal = self._piece_lengths, self._piece_horizontal
+
+        # The cell a piece enters when it moves backward (up/left) or forward (down/right)
+        backward_rows = np.where(horizontal, rows, rows - 1)
+        backward_cols = np.where(horizontal, cols - 1, cols)
+        forward_rows = np.where(horizontal, rows, rows + lengths)
+        forward_cols = np.where(horizontal, cols + lengths, cols)
+        backward_free = (
+            (backward_rows >= 0)
+            & (backward_cols >= 0)
+            & (
+                self.board[np.maximum(backward_rows, 0), np.maximum(backward_cols, 0)]
+                == "o"
+            )
+        )
+        forward_free = (
+            (forward_rows < 6)
+            & (forward_cols < 6)
+            & (
+                self.board[np.minimum(forward_rows, 5), np.minimum(forward_cols, 5)]
+                == "o"
+            )
+        )
+
+        mask = np.zeros((self.max_pieces, 4), dtype=bool)
+        num_pieces = len(self.pieces)
+        mask[:num_pieces, 0] = ~horizontal & backward_free  # up
+        mask[:num_pieces, 1] = ~horizontal & forward_free  # down
+        mask[:num_pieces, 2] = horizontal & backward_free  # left
+        mask[:num_pieces, 3] = horizontal & forward_free  # right
+        return mask
+
+    def legal_actions(self):
+        """Return every [piece_index, direction] action that moves a piece."""
+        return np.argwhere(self.action_mask()).tolist()
+
     def reset(self, *, seed=None, options=None):
+        """Reset the board, optionally switching to a new one.
+
+        A new board is drawn if resample_on_reset is True or if options contains one of:
+        "board_description" (a board string), "board_index" (an index into the board pool,
+        or into the rush.txt index which is sorted by length), "resample" (True for a random
+        board, False to keep the current one even if resample_on_reset is True) or
+        "min_length"/"max_length" (a random rush.txt board with an optimal length in that
+        inclusive range). Otherwise the current board is restored.
+        """
         super().reset(seed=seed)
+        options = options or {}
+        resample = options.get("resample", self.resample_on_reset)
+        if resample or any(
+            key in options
+            for key in ("board_description", "board_index", "min_length", "max_length")
+        ):
+            num_steps_to_finish, board_description = self._choose_board(options)
+            num_pieces = len(set(board_description) - set("ox"))
+            if num_pieces > self.max_pieces:
+                raise ValueError(
+                    f"Board has {num_pieces} pieces, but the action space only "
+                    f"supports {self.max_pieces}."
+                )
+            self._set_board(board_description, num_steps_to_finish)
         self.board = np.array(list(self.board_description)).reshape(6, 6)
+        self._init_piece_tables()
+        self._draw_board()
         if self.render_mode == "human":
             self.render()
         return self._get_obs(), {"num_steps_to_finish": self.num_steps_to_finish}
 
     def step(self, action):
-        piece = list(self.pieces)[action[0]]
-        direction = action[1]
-        moved = self._move_piece(piece, direction)
+        if action[0] < len(self.pieces):
+            piece = self.pieces[action[0]]
+            direction = action[1]
+            moved = self._move_piece(piece, direction)
         done = self._check_win()
         reward = 0 if done else -1
         if self.render_mode == "human":
@@ -167,80 +388,120 @@ class RushHourEnv(gym.Env):
             {"num_steps_to_finish": self.num_steps_to_finish},
         )
 
+    def set_observation_buffer(self, buffer: np.ndarray):
+        """Write observations into buffer instead of returning a new array on every step.
+
+        Image observations are then painted straight into buffer, so e.g. a vector
+        environment can give each environment a slice of one shared-memory array and
+        never copy a frame. reset and step return buffer itself, which changes in place.
+
+        Parameters:
+        -----------
+        buffer : np.ndarray
+            Writable array with the shape and dtype of the observation space.
+
+        Raises:
+        -------
+        ValueError
+            If buffer does not match the observation space, or the observations are text.
+        """
+        if self.obs_type == "text":
+            raise ValueError("Text observations cannot be written to a buffer.")
+        self._observation_buffer = check_observation_buffer(
+            buffer, self.observation_space
+        )
+        if self._canvas is not None:
+            self._canvas.set_frame(buffer)
+
     def _get_obs(self):
-        if self.obs_type == "rgb":
-            # Create an image representation of the board
+        if self._canvas is not None:
+            if self._observation_buffer is not None:
+                return self._canvas.frame
+            return self._canvas.frame.copy()
+        elif self.obs_type in ["index", "one_hot"]:
+            observation = board_observation(
+                self._index_board,
+                self.obs_type,
+                self.max_pieces + 2,
+                self.channels_first,
+            )
+            if self._observation_buffer is None:
+                return observation
+            self._observation_buffer[...] = observation
+            return self._observation_buffer
+        else:
+            return self.board.copy()
+
+    def _get_sprite(self, symbol):
+        # A cell drawn once with PIL: its color, the top and left grid lines, and the
+        # piece index as label. Labels depend on the board, so they are part of the key.
+        label = self._piece_index.get(symbol)
+        key = (symbol, label)
+        if key not in self._sprites:
             cell_size = self.cell_size
-            img = Image.new("RGB", (6 * cell_size, 6 * cell_size), color="white")
+            img = Image.new("RGB", (cell_size, cell_size), color="white")
             draw = ImageDraw.Draw(img)
+            draw.rectangle(
+                [0, 0, cell_size, cell_size],
+                fill=self.colors[symbol],
+                outline="black",
+            )
+            if label is not None:
+                draw.text(
+                    (cell_size // 2, cell_size // 2),
+                    str(label),
+                    fill="black",
+                    anchor="mm",
+                )
+            if self.obs_type == "grayscale":
+                img = img.convert("L")
+            sprite = np.array(img).reshape(cell_size, cell_size, -1)
+            self._sprites[key] = self._canvas.layout(sprite)
+        return self._sprites[key]
+
+    def _draw_cell(self, pos):
+        self._canvas.paint(pos, self._get_sprite(self.board[pos]))
 
+    def _draw_board(self):
+        if self._canvas is not None:
             for i in range(6):
                 for j in range(6):
-                    color = self.colors[self.board[i, j]]
-                    draw.rectangle(
-                        [
-                            j * cell_size,
-                            i * cell_size,
-                            (j + 1) * cell_size,
-                            (i + 1) * cell_size,
-                        ],
-                        fill=color,
-                        outline="black",
-                    )
-                    if (
-                        str(self.board[i, j].lower()) != "o"
-                        and str(self.board[i, j]) != "x"
-                    ):
-                        draw.text(
-                            (
-                                j * cell_size + cell_size // 2,
-                                i * cell_size + cell_size // 2,
-                            ),
-                            str(self.pieces.index(self.board[i, j])),
-                            fill="black",
-                            anchor="mm",
-                        )
-            return np.array(img)
-        else:
-            return self.board.copy()
+                    self._draw_cell((i, j))
 
     def _move_piece(self, piece, direction):
-        positions = np.argwhere(self.board == piece)
-        if len(positions) == 0:
+        index = self._piece_index.get(piece)
+        if index is None:
             return False
 
-        if self.piece_orientations[piece] == "H":
+        row, col = int(self._piece_rows[index]), int(self._piece_cols[index])
+        length = int(self._piece_lengths[index])
+        if self._piece_horizontal[index]:
             if direction == 0 or direction == 1:  # up or down
-                new_pos = positions
+                return True
             elif direction == 2:  # left
-                new_pos = positions - [0, 1]
-            elif direction == 3:  # right
-                new_pos = positions + [0, 1]
+                enter, leave, step = (row, col - 1), (row, col + length - 1), (0, -1)
+            else:  # right
+                enter, leave, step = (row, col + length), (row, col), (0, 1)
         else:
             if direction == 0:  # up
-                new_pos = positions - [1, 0]
+                enter, leave, step = (row - 1, col), (row + length - 1, col), (-1, 0)
             elif direction == 1:  # down
-                new_pos = positions + [1, 0]
-            elif direction == 2 or direction == 3:  # left or right
-                new_pos = positions
-
-        # print("pre-valid - ", self.board)
-        if self._is_valid_move(positions, new_pos):
-            self.board[tuple(positions.T)] = "o"
-            self.board[tuple(new_pos.T)] = piece
-            # print("valid move -", self.board)
-            return True
-        return False
-
-    def _is_valid_move(self, current_pos, new_pos):
-        if np.any(new_pos < 0) or np.any(new_pos >= 6):
+                enter, leave, step = (row + length, col), (row, col), (1, 0)
+            else:  # left or right
+                return True
+
+        # Only the cell the piece moves into has to be free
+        if not (0 <= enter[0] < 6 and 0 <= enter[1] < 6) or self.board[enter] != "o":
             return False
-        for pos in new_pos:
-            if (
-                tuple(pos) not in [tuple(p) for p in current_pos]
-                and self.board[tuple(pos)] != "o"
-            ):
-                return False
+        self.board[leave] = "o"
+        self.board[enter] = piece
+        self._index_board[leave] = 0
+        self._index_board[enter] = index + 2
+        if self._canvas is not None:
+            self._draw_cell(leave)
+            self._draw_cell(enter)
+        self._piece_rows[index] += step[0]
+        self._piece_cols[index] += step[1]
         return True
 
     def _check_win(self):
@@ -248,7 +509,12 @@ class RushHourEnv(gym.Env):
 
     def render(self):
         if self.obs_type == "rgb":
+            # matplotlib is only imported when rendering, it is slow to import
+            from matplotlib import pyplot as plt
+
             img = self._get_obs()
+            if self.channels_first:
+                img = img.transpose(1, 2, 0)
             plt.imshow(img)
             plt.xticks([])
             plt.yticks([])
@@ -257,3 +523,41 @@ class RushHourEnv(gym.Env):
             for row in self.board:
                 print(" ".join(row))
             print()
+
+    def enable_timing(self, callback=None):
+        """Time the phases of step and reset listed in TIMED_PHASES.
+
+        Until this is called the environment runs no timing code at all.
+
+        Parameters:
+        -----------
+        callback : Callable, optional
+            Called as callback(phase, seconds) after every timed call. It is pickled
+            with the environment, so pickling a timed environment needs a picklable
+            callback.
+
+        Returns:
+        --------
+        timing.PhaseTimer
+            The timer collecting the durations, see timing_stats.
+        """
+        self._timer = timing.PhaseTimer(callback)
+        timing.enable_timing(self, self.TIMED_PHASES, self._timer)
+        return self._timer
+
+    def disable_timing(self):
+        timing.disable_timing(self, self.TIMED_PHASES)
+        self._timer = None
+
+    def __getstate__(self):
+        # The timed wrappers cannot be pickled, they are installed again from _timer
+        return timing.without_timing(self.__dict__, self.TIMED_PHASES)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._timer is not None:
+            timing.enable_timing(self, self.TIMED_PHASES, self._timer)
+
+    def timing_stats(self):
+        """Return the count, total, mean, percentiles and max duration of every timed phase."""
+        return self._timer.stats() if self._timer is not None else {}
@@ -0,0 +1,432 @@
+import numpy as np
+from gymnasium import spaces
+from gymnasium.experimental.vector import VectorEnv
+from gymnasium.vector.utils import batch_space
+from PIL import Image, ImageDraw
+from typing import Optional, Sequence
+
+from .rush_database import get_database
+from .tiles import OBS_TYPES, observation_shape
+
+
+def encode_boards(board_descriptions):
+    """Convert board descriptions to a (num_boards, 36) uint8 array of characters."""
+    return np.frombuffer(
+        "".join(board_descriptions).encode("ascii"), dtype=np.uint8
+    ).reshape(-1, 36)
+
+
+class _BatchCanvas:
+    def __init__(self, num_envs, sprites, channels_first=False):
+        # A batch of 6x6 board frames painted from one (cell_size, cell_size, channels)
+        # sprite per class
+        self.channels_first = channels_first
+        self.cell_size = cell_size = sprites.shape[1]
+        channels = sprites.shape[-1]
+        if channels_first:
+            self.sprites = np.ascontiguousarray(np.moveaxis(sprites, -1, 1))
+            shape = (num_envs, channels, 6 * cell_size, 6 * cell_size)
+        else:
+            self.sprites = sprites
+            shape = (num_envs, 6 * cell_size, 6 * cell_size, channels)
+        self.frames = np.zeros(shape, dtype=np.uint8)
+
+    def _cells(self):
+        # View of the frames indexed by (env, row, column) first
+        cs = self.cell_size
+        if self.channels_first:
+            return self.frames.reshape(len(self.frames), -1, 6, cs, 6, cs)
+        return self.frames.reshape(len(self.frames), 6, cs, 6, cs, -1)
+
+    def paint_boards(self, boards, env_ids):
+        sprites = self.sprites[boards[env_ids]]
+        if self.channels_first:
+            self._cells()[env_ids] = sprites.transpose(0, 3, 1, 4, 2, 5)
+        else:
+            self._cells()[env_ids] = sprites.transpose(0, 1, 3, 2, 4, 5)
+
+    def paint_cells(self, boards, env_ids, rows, cols):
+        sprites = self.sprites[boards[env_ids, rows, cols]]
+        if self.channels_first:
+            self._cells()[env_ids, :, rows, :, cols] = sprites
+        else:
+            self._cells()[env_ids, rows, :, cols] = sprites
+
+
+class RushHourVectorEnv(VectorEnv):
+    metadata = {"render_modes": ["rgb_array"], "autoreset": True}
+
+    def __init__(
+        self,
+        num_envs: int = 1,
+        board_description: Optional[str] = None,
+        obs_type: Optional[str] = None,
+        rush_txt_path: Optional[str] = None,
+        board_pool: Optional[Sequence[str]] = None,
+        min_length: Optional[int] = None,
+        max_length: Optional[int] = None,
+        max_pieces: int = 18,
+        cell_size: int = 50,
+        channels_first: bool = False,
+        render_mode: Optional[str] = None,
+        time_steps_limit: Optional[int] = None,
+        max_episode_steps: Optional[int] = None,
+        copy: bool = True,
+    ):
+        """
+        Initialize a batch of Rush Hour games that are stepped together.
+
+        All boards live in a single (num_envs, 6, 6) uint8 array of classes (0 empty,
+        1 wall, 2 + k the k-th piece in sorted order, as in RushHourEnv's 'index'
+        observations) next to per-piece tables of anchors, lengths and orientations.
+        A batch of [piece, direction] actions is applied with vectorized NumPy
+        operations, with the rules of RushHourEnv._move_piece and RushHourEnv._check_win.
+
+        Parameters:
+        -----------
+        num_envs : int, Optional
+            Number of games in the batch.
+            Default is 1.
+
+        board_description : str, Optional
+            If given, every game plays this board. Otherwise boards are drawn from
+            board_pool or rush.txt on reset and autoreset.
+
+        obs_type : str, Optional
+            'index', 'one_hot', 'rgb' or 'grayscale', see RushHourEnv.
+            Default is 'index'.
+
+        rush_txt_path : str, Optional
+            The rush.txt file boards are drawn from. If None, the bundled rush.txt is used.
+
+        board_pool : Sequence[str], Optional
+            An in-memory pool of board descriptions to draw boards from instead of rush.txt.
+
+        min_length, max_length : int, Optional
+            Inclusive bounds on the optimal number of moves of the boards drawn from rush.txt.
+
+        max_pieces : int, Optional
+            The number of pieces the action space is sized for.
+            Default is 18, the most a 6x6 board can hold.
+
+        cell_size : int, Optional
+            The width and height of a board cell in pixels for images.
+            Default is 50.
+
+        channels_first : bool, Optional
+            If True, images and one-hot observations are laid out channels first.
+            Default is False.
+
+        render_mode : str, Optional
+            'rgb_array' to get a (num_envs, 6 * cell_size, 6 * cell_size, 3) batch of
+            frames from render, whatever the observation type.
+            Default is None.
+
+        time_steps_limit : int, Optional
+            Maximum number of time steps of each episode. If None, there is no limit.
+
+        max_episode_steps : int, Optional
+            Used as the time steps limit when time_steps_limit is None, as passed by
+            gymnasium.make_vec.
+
+        copy : bool, Optional
+            If True, reset and step return a copy of the observations.
+            Default is True.
+
+        Notes:
+        ------
+        - Actions are the same as for RushHourEnv, one [piece_index, direction] per game.
+        - Games that are won or truncated are reset automatically with a new board;
+          their last observation and info are returned in info["final_observation"]
+          and info["final_info"].
+        - info["num_steps_to_finish"] is the optimal number of moves of every board,
+          or -1 if it is not known (boards not drawn from rush.txt).
+        - Piece colors are fixed per piece index, with the red car 'A' in red.
+        """
+        super(RushHourVectorEnv, self).__init__()
+
+        if obs_type is None:
+            obs_type = "index"
+        assert obs_type in OBS_TYPES, "Invalid observation type."
+        assert render_mode in [None, "rgb_array"], "Invalid render mode."
+        self.num_envs = num_envs
+        self.obs_type = obs_type
+        self.max_pieces = max_pieces
+        self.cell_size = cell_size
+        self.channels_first = channels_first
+        self.render_mode = render_mode
+        self.copy = copy
+
+        self.rush_txt_path = rush_txt_path
+        self.min_length = min_length
+        self.max_length = max_length
+        self._pool = None
+        if board_description is not None:
+            self._pool = encode_boards([board_description])
+        elif board_pool is not None:
+            self._pool = encode_boards(board_pool)
+        else:
+            # Opened once per process and memory-mapped, see RushHourDatabase
+            self._database = get_database(rush_txt_path)
+            self._database_range = self._database.index_range(min_length, max_length)
+            if self._database_range[0] == self._database_range[1]:
+                raise ValueError("No boards with a length in the given range.")
+
+        if time_steps_limit is None:
+            time_steps_limit = max_episode_steps
+        self.time_steps_limit = time_steps_limit if time_steps_limit else np.inf
+
+        num_classes = max_pieces + 2
+        self.single_action_space = spaces.MultiDiscrete(np.array([max_pieces, 4]))
+        shape = observation_shape(
+            obs_type, 6, 6, cell_size, num_classes, channels_first
+        )
+        if obs_type == "index":
+            high = num_classes - 1
+        else:
+            high = 1 if obs_type == "one_hot" else 255
+        self.single_observation_space = spaces.Box(
+            low=0, high=high, shape=shape, dtype=np.uint8
+        )
+        self.action_space = batch_space(self.single_action_space, num_envs)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+
+        self.boards = np.zeros((num_envs, 6, 6), dtype=np.uint8)
+        self.num_pieces = np.zeros(num_envs, dtype=np.int64)
+        self.num_steps_to_finish = np.full(num_envs, -1, dtype=np.int64)
+        self.current_time_step = np.zeros(num_envs, dtype=np.int64)
+        self._red_class = np.zeros(num_envs, dtype=np.uint8)
+        self._piece_rows = np.zeros((num_envs, max_pieces), dtype=np.int64)
+        self._piece_cols = np.zeros((num_envs, max_pieces), dtype=np.int64)
+        self._piece_lengths = np.zeros((num_envs, max_pieces), dtype=np.int64)
+        self._piece_horizontal = np.zeros((num_envs, max_pieces), dtype=bool)
+
+        # Image observations are painted into one buffer, repainting only the two
+        # cells a move changes, from one prerendered cell per class
+        self._canvas = None
+        if obs_type in ["rgb", "grayscale"]:
+            self._canvas = _BatchCanvas(
+                num_envs,
+                self._make_sprites(obs_type == "grayscale"),
+                channels_first,
+            )
+        self._render_canvas = None
+        if render_mode == "rgb_array":
+            if obs_type == "rgb" and not channels_first:
+                self._render_canvas = self._canvas
+            else:
+                self._render_canvas = _BatchCanvas(num_envs, self._make_sprites(False))
+
+    def _make_sprites(self, grayscale):
+        # One cell per class, drawn like RushHourEnv._get_sprite: the color, the top
+        # and left grid lines and the piece index as label
+        rng = np.random.default_rng(0)
+        colors = [(255, 255, 255), (0, 0, 0), (255, 0, 0)] + [
+            tuple(int(c) for c in rng.integers(0, 256, 3))
+            for _ in range(self.max_pieces - 1)
+        ]
+        cell_size = self.cell_size
+        sprites = []
+        for index, color in enumerate(colors):
+            img = Image.new("RGB", (cell_size, cell_size), color="white")
+            draw = ImageDraw.Draw(img)
+            draw.rectangle([0, 0, cell_size, cell_size], fill=color, outline="black")
+            if index >= 2:
+                draw.text(
+                    (cell_size // 2, cell_size // 2),
+                    str(index - 2),
+                    fill="black",
+                    anchor="mm",
+                )
+            if grayscale:
+                img = img.convert("L")
+            sprites.append(np.array(img).reshape(cell_size, cell_size, -1))
+        return np.stack(sprites)
+
+    def _draw_boards(self, count):
+        # (lengths, (count, 36) characters) of new boards
+        if self._pool is not None:
+            indices = self.np_random.integers(len(self._pool), size=count)
+            return np.full(count, -1), self._pool[indices]
+        start, stop = self._database_range
+        records = self._database.records[self.np_random.integers(start, stop, count)]
+        boards = np.frombuffer(records["board"].tobytes(), dtype=np.uint8)
+        return records["length"].astype(np.int64), boards.reshape(count, 36)
+
+    def _reset_boards(self, env_ids):
+        # Draw new boards for the selected games and rebuild their piece tables
+        count = len(env_ids)
+        lengths, characters = self._draw_boards(count)
+
+        # Pieces are numbered in sorted order, like RushHourEnv.pieces
+        present = np.zeros((count, 256), dtype=bool)
+        present[np.arange(count)[:, None], characters] = True
+        present[:, [ord("o"), ord("x")]] = False
+        num_pieces = present.sum(axis=1)
+        if np.any(num_pieces > self.max_pieces):
+            raise ValueError(
+                f"Board has {num_pieces.max()} pieces, but the action space only "
+                f"supports {self.max_pieces}."
+            )
+        classes = np.where(present, np.cumsum(present, axis=1) + 1, 0)
+        classes[:, ord("x")] = 1
+        boards = classes[np.arange(count)[:, None], characters].astype(np.uint8)
+
+        # Anchor (first cell in row-major order), length and orientation of each piece
+        cells = boards[:, :, None] == np.arange(2, self.max_pieces + 2)
+        first = np.argmax(cells, axis=1)
+        last = 35 - np.argmax(cells[:, ::-1], axis=1)
+        self._piece_rows[env_ids], self._piece_cols[env_ids] = np.divmod(first, 6)
+        self._piece_lengths[env_ids] = cells.sum(axis=1)
+        self._piece_horizontal[env_ids] = first // 6 == last // 6
+
+        self.boards[env_ids] = boards.reshape(count, 6, 6)
+        self.num_pieces[env_ids] = num_pieces
+        self.num_steps_to_finish[env_ids] = lengths
+        self._red_class[env_ids] = classes[:, ord("A")]
+        self.current_time_step[env_ids] = 0
+        for canvas in {self._canvas, self._render_canvas} - {None}:
+            canvas.paint_boards(self.boards, env_ids)
+
+    def action_mask(self):
+        """Return which actions move a piece, for every game.
+
+        Returns:
+        --------
+        numpy.ndarray
+            A boolean array of shape (num_envs, max_pieces, 4), see RushHourEnv.action_mask.
+        """
+        rows, cols = self._piece_rows, self._piece_cols
+        lengths, horizontal = self._piece_lengths, self._piece_horizontal
+        env_ids = np.arange(self.num_envs)[:, None]
+
+        backward_rows = np.where(horizontal, rows, rows - 1)
+        backward_cols = np.where(horizontal, cols - 1, cols)
+        forward_rows = np.where(horizontal, rows, rows + lengths)
+        forward_cols = np.where(horizontal, cols + lengths, cols)
+        backward_free = (
+            (backward_rows >= 0)
+            & (backward_cols >= 0)
+            & (
+                self.boards[
+                    env_ids, np.maximum(backward_rows, 0), np.maximum(backward_cols, 0)
+                ]
+                == 0
+            )
+        )
+        forward_free = (
+            (forward_rows < 6)
+            & (forward_cols < 6)
+            & (
+                self.boards[
+                    env_ids, np.minimum(forward_rows, 5), np.minimum(forward_cols, 5)
+                ]
+                == 0
+            )
+        )
+        exists = np.arange(self.max_pieces) < self.num_pieces[:, None]
+
+        mask = np.zeros((self.num_envs, self.max_pieces, 4), dtype=bool)
+        mask[:, :, 0] = exists & ~horizontal & backward_free  # up
+        mask[:, :, 1] = exists & ~horizontal & forward_free  # down
+        mask[:, :, 2] = exists & horizontal & backward_free  # left
+        mask[:, :, 3] = exists & horizontal & forward_free  # right
+        return mask
+
+    def _get_obs(self):
+        if self._canvas is not None:
+            observation = self._canvas.frames
+        elif self.obs_type == "index":
+            observation = self.boards
+        else:
+            one_hot = (self.boards[..., None] == np.arange(self.max_pieces + 2)).astype(
+                np.uint8
+            )
+            return np.moveaxis(one_hot, -1, 1) if self.channels_first else one_hot
+        return observation.copy() if self.copy else observation
+
+    def _get_info(self):
+        return {
+            "num_steps_to_finish": self.num_steps_to_finish.copy(),
+            "_num_steps_to_finish": np.ones(self.num_envs, dtype=bool),
+        }
+
+    def render(self):
+        if self._render_canvas is not None:
+            return self._render_canvas.frames.copy()
+
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed)
+        self._reset_boards(np.arange(self.num_envs))
+        return self._get_obs(), self._get_info()
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        self.current_time_step += 1
+        env_ids = np.arange(self.num_envs)
+
+        # Actions for pieces a board does not have leave it unchanged
+        pieces = np.minimum(actions[:, 0], self.max_pieces - 1)
+        directions = actions[:, 1]
+        rows = self._piece_rows[env_ids, pieces]
+        cols = self._piece_cols[env_ids, pieces]
+        lengths = self._piece_lengths[env_ids, pieces]
+        horizontal = self._piece_horizontal[env_ids, pieces]
+
+        # Horizontal pieces move left (2) or right (3), vertical ones up (0) or
+        # down (1); down and right enter the cell after the piece, up and left the
+        # cell before it, and only that cell has to be free
+        along = np.where(horizontal, directions >= 2, directions <= 1)
+        forward = (directions == 1) | (directions == 3)
+        enter = np.where(forward, lengths, -1)
+        leave = np.where(forward, 0, lengths - 1)
+        enter_rows = np.where(horizontal, rows, rows + enter)
+        enter_cols = np.where(horizontal, cols + enter, cols)
+        leave_rows = np.where(horizontal, rows, rows + leave)
+        leave_cols = np.where(horizontal, cols + leave, cols)
+        inside = (
+            (enter_rows >= 0) & (enter_rows < 6) & (enter_cols >= 0) & (enter_cols < 6)
+        )
+        free = (
+            self.boards[env_ids, np.clip(enter_rows, 0, 5), np.clip(enter_cols, 0, 5)]
+            == 0
+        )
+        moves = np.flatnonzero(
+            (actions[:, 0] < self.num_pieces) & along & inside & free
+        )
+
+        step = np.where(forward, 1, -1)[moves]
+        self.boards[moves, leave_rows[moves], leave_cols[moves]] = 0
+        self.boards[moves, enter_rows[moves], enter_cols[moves]] = pieces[moves] + 2
+        self._piece_rows[moves, pieces[moves]] += np.where(horizontal[moves], 0, step)
+        self._piece_cols[moves, pieces[moves]] += np.where(horizontal[moves], step, 0)
+        for canvas in {self._canvas, self._render_canvas} - {None}:
+            for rows, cols in [(leave_rows, leave_cols), (enter_rows, enter_cols)]:
+                canvas.paint_cells(self.boards, moves, rows[moves], cols[moves])
+
+        terminated = (self.boards[:, 2, 5] == self._red_class) & (self._red_class > 0)
+        truncated = self.current_time_step >= self.time_steps_limit
+        reward = np.where(terminated, 0.0, -1.0)
+
+        # Keep the final step of finished games and reset them
+        done = terminated | truncated
+        final_observation = np.full(self.num_envs, None, dtype=object)
+        final_info = np.full(self.num_envs, None, dtype=object)
+        if done.any():
+            observation = self._get_obs()
+            for env_id in np.flatnonzero(done):
+                final_observation[env_id] = observation[env_id].copy()
+                final_info[env_id] = {
+                    "num_steps_to_finish": int(self.num_steps_to_finish[env_id])
+                }
+            self._reset_boards(np.flatnonzero(done))
+
+        observation = self._get_obs()
+        info = self._get_info()
+        if done.any():
+            info["final_observation"] = final_observation
+            info["_final_observation"] = done
+            info["final_info"] = final_info
+            info["_final_info"] = done
+
+        return observation, reward, terminated, truncated, info
@@ -0,0 +1,89 @@
+import numpy as np
+
+# Start state generators for the n-Puzzle. Boards are square integer arrays (or
+# batches of them) in which tile k belongs at the flat position k, with the
+# blank tile 0 in the top-left corner of the goal board.
+SCRAMBLES = ["shuffle", "solvable", "random_walk"]
+
+# Row and column offsets for moving the blank up, right, down, left
+_DY = np.array([-1, 0, 1, 0])
+_DX = np.array([0, 1, 0, -1])
+
+
+def is_solvable(boards):
+    """Return whether each board can be solved with n-Puzzle moves.
+
+    Every move swaps the blank with a neighbour, which flips the parity of the
+    permutation and of the blank's Manhattan distance to its goal cell at the
+    same time, so a board is solvable iff both parities agree.
+
+    Args:
+        boards (np.ndarray): A (size, size) board or a (k, size, size) batch of boards.
+
+    Returns:
+        bool or np.ndarray: Solvability of the board, or of each board in the batch.
+    """
+    size = boards.shape[-1]
+    flat = boards.reshape(-1, size * size)
+    upper = np.triu(np.ones((size * size, size * size), dtype=bool), k=1)
+    inversions = np.count_nonzero(
+        (flat[:, :, None] > flat[:, None, :]) & upper, axis=(1, 2)
+    )
+    blank_row, blank_col = np.divmod(np.argmin(flat, axis=1), size)
+    solvable = inversions % 2 == (blank_row + blank_col) % 2
+    return solvable if boards.ndim == 3 else bool(solvable[0])
+
+
+def make_solvable(boards):
+    """Repair unsolvable boards in place by swapping two non-blank tiles.
+
+    For a fixed blank position the repair is a bijection between unsolvable and
+    solvable boards, so uniformly shuffled boards stay uniform over the solvable
+    ones.
+
+    Args:
+        boards (np.ndarray): A (size, size) board or a (k, size, size) batch of boards.
+    """
+    size = boards.shape[-1]
+    flat = boards.reshape(-1, size * size)
+    board_ids = np.flatnonzero(~np.atleast_1d(is_solvable(boards)))
+    blank = np.argmin(flat[board_ids], axis=1)
+    pos_1 = np.where(blank == 0, 1, 0)
+    pos_2 = np.where(blank <= 1, 2, 1)
+    flat[board_ids, pos_1], flat[board_ids, pos_2] = (
+        flat[board_ids, pos_2],
+        flat[board_ids, pos_1],
+    )
+
+
+def random_walk_boards(num_boards, size, num_moves, rng):
+    """Scramble goal boards with random moves of the blank tile.
+
+    The walk never immediately undoes its previous move, so the boards are at
+    most num_moves moves away from the goal and usually close to it.
+
+    Args:
+        num_boards (int): Number of boards to generate.
+        size (int): Width and height of the board.
+        num_moves (int): Number of random moves applied to each board.
+        rng (np.random.Generator): Random number generator, e.g. env.np_random.
+
+    Returns:
+        np.ndarray: A (num_boards, size, size) batch of boards.
+    """
+    flat = np.tile(np.arange(size * size), (num_boards, 1))
+    board_ids = np.arange(num_boards)
+    blank = np.zeros(num_boards, dtype=int)
+    previous = np.full(num_boards, -1)
+    for _ in range(num_moves):
+        i, j = np.divmod(blank, size)
+        valid = np.stack([i > 0, j < size - 1, i < size - 1, j > 0], axis=1)
+        reverse = np.where(previous >= 0, (previous + 2) % 4, -1)
+        valid &= np.arange(4) != reverse[:, None]
+        action = np.argmax(np.where(valid, rng.random((num_boards, 4)), -1), axis=1)
+        new_blank = blank + _DY[action] * size + _DX[action]
+        flat[board_ids, blank] = flat[board_ids, new_blank]
+        flat[board_ids, new_blank] = 0
+        blank = new_blank
+        previous = action
+    return flat.reshape(num_boards, size, size)
@@ -0,0 +1,198 @@
+import multiprocessing
+import traceback
+from typing import Callable, Optional, Sequence
+
+import gymnasium as gym
+import numpy as np
+from gymnasium.experimental.vector import VectorEnv
+from gymnasium.vector.utils import CloudpickleWrapper, batch_space
+from PIL import Image
+
+
+def _without_images(info):
+    # PIL images are slow to pickle, they are left in the worker
+    return {
+        key: value for key, value in info.items() if not isinstance(value, Image.Image)
+    }
+
+
+def _worker(index, env_fn, pipe, parent_pipe, shared_array, shape, dtype, info_images):
+    parent_pipe.close()
+    env = None
+    observations = np.frombuffer(shared_array, dtype=dtype).reshape(shape)
+    try:
+        env = env_fn()
+        # The environment renders its observations straight into its slice
+        env.unwrapped.set_observation_buffer(observations[index])
+        # Tell the parent the environment was created
+        pipe.send((None, True))
+        while True:
+            command, data = pipe.recv()
+            if command == "reset":
+                _, info = env.reset(**data)
+                if not info_images:
+                    info = _without_images(info)
+                pipe.send((info, True))
+            elif command == "step":
+                _, reward, terminated, truncated, info = env.step(data)
+                if not info_images:
+                    info = _without_images(info)
+                if terminated or truncated:
+                    # The reset paints over the final frame, so only it is copied
+                    final_observation = observations[index].copy()
+                    final_info = info
+                    _, info = env.reset()
+                    if not info_images:
+                        info = _without_images(info)
+                    info["final_observation"] = final_observation
+                    info["final_info"] = final_info
+                pipe.send(((reward, terminated, truncated, info), True))
+            elif command == "close":
+                pipe.send((None, True))
+                break
+    except (KeyboardInterrupt, Exception):
+        pipe.send((traceback.format_exc(), False))
+    finally:
+        if env is not None:
+            env.close()
+
+
+class SharedMemoryVectorEnv(VectorEnv):
+    def __init__(
+        self,
+        env_fns: Sequence[Callable[[], gym.Env]],
+        context: Optional[str] = None,
+        copy: bool = True,
+        info_images: bool = False,
+    ):
+        """Run environments in worker processes that render into one shared-memory array.
+
+        Every worker gives its environment a slice of a (num_envs, *observation_shape)
+        shared array with set_observation_buffer, so the environment paints its frames
+        there and only rewards, flags and infos go through the pipes. Unlike
+        gymnasium's AsyncVectorEnv, no frame is copied or pickled on a step.
+
+        Args:
+            env_fns (Sequence[Callable]): Functions creating the environments, e.g.
+                lambda: gym.make("n_Puzzle-v0"). The unwrapped environments must have
+                set_observation_buffer; wrappers changing the observations are bypassed.
+            context (str, optional): Multiprocessing start method ("fork", "spawn",
+                "forkserver"). Defaults to the platform default.
+            copy (bool): If True, reset and step return a copy of the shared observations,
+                otherwise the shared array itself, which the next step overwrites.
+                Defaults to True.
+            info_images (bool): If False, PIL images (the "original_image" and "goal_image"
+                infos) are dropped in the workers instead of being pickled. Pass
+                info_images="never" to the environments to not draw them at all.
+                Defaults to False.
+
+        Note:
+            Environments that terminate or get truncated are reset automatically; their
+            last observation and info are returned in info["final_observation"] and
+            info["final_info"].
+        """
+        super(SharedMemoryVectorEnv, self).__init__()
+        self.parent_pipes, self.processes = [], []
+
+        dummy_env = env_fns[0]()
+        self.metadata = dummy_env.metadata
+        self.single_observation_space = dummy_env.observation_space
+        self.single_action_space = dummy_env.action_space
+        dummy_env.close()
+        if not self.single_observation_space.shape:
+            raise ValueError("Only array observations can be shared.")
+
+        self.num_envs = len(env_fns)
+        self.copy = copy
+        self.observation_space = batch_space(
+            self.single_observation_space, self.num_envs
+        )
+        self.action_space = batch_space(self.single_action_space, self.num_envs)
+
+        ctx = multiprocessing.get_context(context)
+        shape = (self.num_envs,) + self.single_observation_space.shape
+        dtype = np.dtype(self.single_observation_space.dtype)
+        self._shared_array = ctx.RawArray("B", int(np.prod(shape)) * dtype.itemsize)
+        self._observations = np.frombuffer(self._shared_array, dtype=dtype).reshape(
+            shape
+        )
+
+        for index, env_fn in enumerate(env_fns):
+            parent_pipe, child_pipe = ctx.Pipe()
+            process = ctx.Process(
+                target=_worker,
+                name=f"SharedMemoryVectorEnv-{index}",
+                args=(
+                    index,
+                    CloudpickleWrapper(env_fn),
+                    child_pipe,
+                    parent_pipe,
+                    self._shared_array,
+                    shape,
+                    dtype.str,
+                    info_images,
+                ),
+                daemon=True,
+            )
+            process.start()
+            child_pipe.close()
+            self.parent_pipes.append(parent_pipe)
+            self.processes.append(process)
+        # Fail here with the worker's traceback if an environment cannot be created
+        self._receive()
+
+    def _receive(self):
+        results = [pipe.recv() for pipe in self.parent_pipes]
+        for index, (result, success) in enumerate(results):
+            if not success:
+                self.close(terminate=True)
+                raise RuntimeError(f"Environment {index} failed:\n{result}")
+        return [result for result, _ in results]
+
+    def _get_obs(self):
+        return self._observations.copy() if self.copy else self._observations
+
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed)
+        if seed is None or isinstance(seed, int):
+            seed = [
+                None if seed is None else seed + index for index in range(self.num_envs)
+            ]
+        assert len(seed) == self.num_envs, "One seed per environment is needed."
+
+        for pipe, env_seed in zip(self.parent_pipes, seed):
+            pipe.send(("reset", {"seed": env_seed, "options": options}))
+        infos = {}
+        for index, info in enumerate(self._receive()):
+            infos = self._add_info(infos, info, index)
+        return self._get_obs(), infos
+
+    def step(self, actions):
+        for pipe, action in zip(self.parent_pipes, actions):
+            pipe.send(("step", action))
+        results = self._receive()
+
+        rewards = np.zeros(self.num_envs)
+        terminations = np.zeros(self.num_envs, dtype=bool)
+        truncations = np.zeros(self.num_envs, dtype=bool)
+        infos = {}
+        for index, (reward, terminated, truncated, info) in enumerate(results):
+            rewards[index] = reward
+            terminations[index] = terminated
+            truncations[index] = truncated
+            infos = self._add_info(infos, info, index)
+        return self._get_obs(), rewards, terminations, truncations, infos
+
+    def close_extras(self, terminate=False):
+        if not terminate:
+            for pipe, process in zip(self.parent_pipes, self.processes):
+                if process.is_alive():
+                    pipe.send(("close", None))
+            for pipe, process in zip(self.parent_pipes, self.processes):
+                if process.is_alive():
+                    pipe.recv()
+        for pipe, process in zip(self.parent_pipes, self.processes):
+            if terminate and process.is_alive():
+                process.terminate()
+            pipe.close()
+            process.join()
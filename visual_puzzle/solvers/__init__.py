@@ -0,0 +1,2 @@
+from .n_puzzle import n_PuzzleSolver
+from .rush_hour import RushHourSolver
@@ -0,0 +1,37 @@
+import numpy as np
+
+
+def solve(board):
+    """Return a shortest sequence of swaps that solves a Jigsaw board.
+
+    Every swap puts one tile in its goal cell, taking the first misplaced cell and
+    the cell holding the tile that belongs there. Such a swap splits a cycle of the
+    board's permutation, so the solution has heuristics.min_swaps(board) swaps.
+
+    Args:
+        board (np.ndarray): A (size, size) board, e.g. JigsawEnv.board.
+
+    Returns:
+        list: Actions in the JigsawEnv "positions" encoding, [[row_1, col_1], [row_2, col_2]].
+    """
+    board = np.asarray(board)
+    size = board.shape[0]
+    tiles = [int(t) for t in board.ravel()]
+    cells = [0] * len(tiles)  # cells[t] is the cell holding tile t
+    for cell, tile in enumerate(tiles):
+        cells[tile] = cell
+
+    actions = []
+    for cell in range(len(tiles)):
+        if tiles[cell] != cell:
+            other = cells[cell]
+            actions.append([list(divmod(cell, size)), list(divmod(other, size))])
+            tiles[cell], tiles[other] = cell, tiles[cell]
+            cells[tiles[other]] = other
+            cells[cell] = cell
+    return actions
+
+
+def optimal_solution_length(board):
+    """Return the minimum number of swaps that solve a Jigsaw board."""
+    return len(solve(board))
@@ -0,0 +1,263 @@
+import os
+from functools import lru_cache
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .. import get_cache_path
+from ..scramble import is_solvable
+
+# Actions follow n_PuzzleEnv: the blank moves 0: up, 1: right, 2: down, 3: left.
+# The extra entry is looked up for the root of the search, which undoes nothing.
+_REVERSE_ACTION = [2, 3, 0, 1, -1]
+
+# Upper bound on the number of entries of the dense table used while building
+# a pattern database, which decides how many tiles go in one pattern.
+_MAX_TABLE_SIZE = 2**24
+
+
+def default_partition(size: int):
+    """Split the tiles 1..size*size-1 into consecutive disjoint patterns.
+
+    Each pattern is as large as possible while its construction table of
+    (size*size)**(len(pattern)+1) entries stays below 16M, e.g. 5-5-5 for the
+    15-puzzle and 6-2 for the 8-puzzle.
+    """
+    n = size * size
+    group_size = 1
+    while group_size < n - 1 and n ** (group_size + 2) <= _MAX_TABLE_SIZE:
+        group_size += 1
+    tiles = list(range(1, n))
+    return [tuple(tiles[i : i + group_size]) for i in range(0, len(tiles), group_size)]
+
+
+def _expand(states, size, num_tiles, powers):
+    # Successors of encoded pattern states, split by whether a pattern tile moved
+    n = size * size
+    digits = (states[:, None] // powers) % n
+    positions, blank = digits[:, :num_tiles], digits[:, num_tiles]
+    row, col = np.divmod(blank, size)
+    free_moves, pattern_moves = [], []
+    for valid, offset in (
+        (row > 0, -size),
+        (col < size - 1, 1),
+        (row < size - 1, size),
+        (col > 0, -1),
+    ):
+        positions_, blank_ = positions[valid], blank[valid]
+        new_blank = blank_ + offset
+        moved = positions_ == new_blank[:, None]
+        new_positions = np.where(moved, blank_[:, None], positions_)
+        new_states = (new_positions * powers[:num_tiles]).sum(
+            axis=1
+        ) + new_blank * powers[num_tiles]
+        moved_any = moved.any(axis=1)
+        free_moves.append(new_states[~moved_any])
+        pattern_moves.append(new_states[moved_any])
+    return np.concatenate(free_moves), np.concatenate(pattern_moves)
+
+
+def build_pattern_database(size: int, pattern: Sequence[int]):
+    """Build an additive pattern database for the given tiles.
+
+    A 0-1 breadth-first search from the goal over the positions of the pattern
+    tiles and the blank, where only moves of pattern tiles cost one move, so
+    that the databases of disjoint patterns can be added up.
+
+    Args:
+        size (int): Width and height of the board.
+        pattern (Sequence[int]): Tiles of the pattern, none of them the blank.
+
+    Returns:
+        np.ndarray: uint8 array indexed by sum(position[k] * n**k) over the
+            pattern tiles k, holding the cost of placing them.
+    """
+    n = size * size
+    num_tiles = len(pattern)
+    powers = n ** np.arange(num_tiles + 1, dtype=np.int64)
+    distances = np.full(n ** (num_tiles + 1), 255, dtype=np.uint8)
+
+    # In the goal tile t sits at position t and the blank at position 0
+    frontier = np.array([np.dot(list(pattern) + [0], powers)], dtype=np.int64)
+    distances[frontier] = 0
+    depth = 0
+    while frontier.size:
+        # Close the layer under moves of tiles outside the pattern, which are free
+        layer, current = [frontier], frontier
+        while current.size:
+            free_moves, _ = _expand(current, size, num_tiles, powers)
+            current = np.unique(free_moves[distances[free_moves] == 255])
+            distances[current] = depth
+            layer.append(current)
+        _, pattern_moves = _expand(np.concatenate(layer), size, num_tiles, powers)
+        frontier = np.unique(pattern_moves[distances[pattern_moves] == 255])
+        depth += 1
+        distances[frontier] = depth
+
+    # The blank position is the most significant digit, minimize it away
+    return distances.reshape(n, n**num_tiles).min(axis=0)
+
+
+def load_pattern_database(size: int, pattern: Sequence[int]):
+    """Load a pattern database from the cache directory, building it if needed."""
+    name = f"n_puzzle_pdb_{size}x{size}_{'-'.join(map(str, pattern))}.npy"
+    path = get_cache_path(name)
+    if os.path.exists(path):
+        return np.load(path)
+    database = build_pattern_database(size, pattern)
+    # Write to a temporary file first so concurrent builders never see partial files
+    temporary_path = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(temporary_path, database)
+    os.replace(temporary_path, path)
+    return database
+
+
+class n_PuzzleSolver:
+    def __init__(self, size: int, partition: Optional[Sequence[Sequence[int]]] = None):
+        """Optimal n-Puzzle solver using IDA* with additive pattern databases.
+
+        Args:
+            size (int): Width and height of the board (e.g. 4 for the 15-puzzle).
+            partition (Sequence[Sequence[int]], optional): Disjoint patterns covering the
+                tiles 1..size*size-1. Defaults to default_partition(size).
+
+        Note:
+            The pattern databases are built on first use and cached on disk, see
+            visual_puzzle.get_cache_path. Boards use the n_PuzzleEnv convention: tile k
+            belongs at the flat position k and the blank (tile 0) in the top-left corner.
+        """
+        self.size = size
+        self.n = size * size
+        self.partition = [
+            tuple(pattern) for pattern in (partition or default_partition(size))
+        ]
+        assert sorted(t for pattern in self.partition for t in pattern) == list(
+            range(1, self.n)
+        ), "The partition must cover every tile except the blank exactly once."
+
+        # Bytes objects are much faster to index from Python than NumPy arrays
+        self._databases = [
+            bytes(load_pattern_database(size, pattern)) for pattern in self.partition
+        ]
+        self._tile_pattern = [(0, 0)] * self.n
+        for index, pattern in enumerate(self.partition):
+            for slot, tile in enumerate(pattern):
+                self._tile_pattern[tile] = (index, self.n**slot)
+
+        # (action, new blank position) for every blank position
+        self._moves = []
+        for pos in range(self.n):
+            row, col = divmod(pos, size)
+            moves = []
+            if row > 0:
+                moves.append((0, pos - size))
+            if col < size - 1:
+                moves.append((1, pos + 1))
+            if row < size - 1:
+                moves.append((2, pos + size))
+            if col > 0:
+                moves.append((3, pos - 1))
+            self._moves.append(moves)
+
+    def heuristic(self, board):
+        """Admissible lower bound on the solution length of a board."""
+        indices = self._pattern_indices([int(t) for t in np.ravel(board)])
+        return sum(db[index] for db, index in zip(self._databases, indices))
+
+    def _pattern_indices(self, tiles):
+        indices = [0] * len(self.partition)
+        for pos, tile in enumerate(tiles):
+            if tile != 0:
+                pattern, power = self._tile_pattern[tile]
+                indices[pattern] += pos * power
+        return indices
+
+    def solve(self, board):
+        """Return an optimal action sequence that solves the board.
+
+        Args:
+            board (np.ndarray): A (size, size) board, e.g. n_PuzzleEnv.board.
+
+        Returns:
+            list[int]: Actions in the n_PuzzleEnv convention (0: up, 1: right, 2: down, 3: left).
+
+        Raises:
+            ValueError: If the board has the wrong shape or cannot be solved.
+        """
+        board = np.asarray(board)
+        if board.shape != (self.size, self.size) or sorted(board.ravel()) != list(
+            range(self.n)
+        ):
+            raise ValueError(f"Expected a permutation of 0..{self.n - 1} as board.")
+        if not is_solvable(board):
+            raise ValueError("Board is not solvable.")
+
+        tiles = [int(t) for t in board.ravel()]
+        indices = self._pattern_indices(tiles)
+        databases = self._databases
+        tile_pattern = self._tile_pattern
+        moves = self._moves
+        reverse = _REVERSE_ACTION
+        path = []
+        blank = tiles.index(0)
+
+        def search(depth, h, bound, previous):
+            # Depth-first search below the bound, returns -1 once solved or
+            # else the smallest f value that exceeded the bound
+            nonlocal blank
+            f = depth + h
+            if f > bound:
+                return f
+            if h == 0:
+                return -1
+            minimum = np.inf
+            for action, new_blank in moves[blank]:
+                if action == reverse[previous]:
+                    continue
+                tile = tiles[new_blank]
+                pattern, power = tile_pattern[tile]
+                old_index = indices[pattern]
+                new_index = old_index + (blank - new_blank) * power
+                database = databases[pattern]
+                new_h = h - database[old_index] + database[new_index]
+
+                old_blank = blank
+                tiles[old_blank], tiles[new_blank] = tile, 0
+                indices[pattern] = new_index
+                blank = new_blank
+                path.append(action)
+
+                result = search(depth + 1, new_h, bound, action)
+                if result < 0:
+                    return result
+
+                path.pop()
+                blank = old_blank
+                tiles[old_blank], tiles[new_blank] = 0, tile
+                indices[pattern] = old_index
+                minimum = min(minimum, result)
+            return minimum
+
+        h = sum(db[index] for db, index in zip(databases, indices))
+        bound = h
+        while True:
+            result = search(0, h, bound, 4)
+            if result < 0:
+                return list(path)
+            bound = result
+
+
+@lru_cache(maxsize=None)
+def get_solver(size: int):
+    """Return a shared n_PuzzleSolver with the default partition for a board size."""
+    return n_PuzzleSolver(size)
+
+
+def solve(board):
+    """Return an optimal action sequence for an n_PuzzleEnv board, see n_PuzzleSolver.solve."""
+    return get_solver(np.shape(board)[0]).solve(board)
+
+
+def optimal_solution_length(board):
+    """Return the number of moves of an optimal solution of an n_PuzzleEnv board."""
+    return len(solve(board))
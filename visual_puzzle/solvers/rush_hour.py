@@ -0,0 +1,181 @@
+from collections import deque
+
+import numpy as np
+
+# Directions follow RushHourEnv.step: horizontal pieces move with 2 (left) and
+# 3 (right), vertical pieces with 0 (up) and 1 (down)
+_BACKWARD = {"H": 2, "V": 0}
+_FORWARD = {"H": 3, "V": 1}
+
+# Every piece anchor (its leftmost or topmost cell along its axis) fits in 3 bits
+_ANCHOR_BITS = 3
+_ANCHOR_MASK = (1 << _ANCHOR_BITS) - 1
+
+
+class RushHourSolver:
+    def __init__(self, board_description):
+        """Breadth-first Rush Hour solver over packed board states.
+
+        A state packs the anchor of every piece into one integer, 3 bits per
+        piece, and occupancy is kept as a 36-bit bitboard, so move generation
+        only does integer arithmetic.
+
+        Parameters:
+        -----------
+        board_description : str or numpy.ndarray
+            The 36-character board string used by RushHourEnv (e.g.
+            ooIBBBGoIJCCGAAJKLoHDDKLxHFFKMoooooM), or a 6x6 board such as RushHourEnv.board.
+
+        Attributes:
+        -----------
+        pieces : list
+            The sorted piece identifiers, indexed like RushHourEnv.pieces.
+        start : int
+            The packed state of the given board.
+        """
+        board = np.asarray(list("".join(np.ravel(board_description)))).reshape(6, 6)
+        self.pieces = sorted(set(board.flatten()) - set("ox"))
+
+        self.walls = 0
+        for i, j in np.argwhere(board == "x"):
+            self.walls |= 1 << (i * 6 + j)
+
+        self.orientations = []
+        self.start = 0
+        # Per piece and anchor: cells covered, and the cell entered by a move
+        # backward/forward from that anchor (None if it would leave the board)
+        self._cells = []
+        self._enter_backward = []
+        self._enter_forward = []
+        for index, piece in enumerate(self.pieces):
+            positions = np.argwhere(board == piece)
+            (row, col), length = positions[0], len(positions)
+            orientation = "H" if positions[0][0] == positions[-1][0] else "V"
+            self.orientations.append(orientation)
+            anchor = col if orientation == "H" else row
+            self.start |= int(anchor) << (_ANCHOR_BITS * index)
+
+            def bit(a):
+                return 1 << (row * 6 + a if orientation == "H" else a * 6 + col)
+
+            cells, backward, forward = [], [], []
+            for a in range(7 - length):
+                cells.append(sum(bit(a + k) for k in range(length)))
+                backward.append(bit(a - 1) if a > 0 else None)
+                forward.append(bit(a + length) if a + length < 6 else None)
+            self._cells.append(cells)
+            self._enter_backward.append(backward)
+            self._enter_forward.append(forward)
+
+        # RushHourEnv._check_win: the car "A" covers the cell (2, 5)
+        self._goal_piece = self.pieces.index("A")
+        self._goal_anchors = {
+            anchor
+            for anchor, cells in enumerate(self._cells[self._goal_piece])
+            if cells & (1 << (2 * 6 + 5))
+        }
+
+    def anchors(self, state):
+        """Unpack the anchor of every piece from a packed state."""
+        return [
+            (state >> (_ANCHOR_BITS * index)) & _ANCHOR_MASK
+            for index in range(len(self.pieces))
+        ]
+
+    def is_solved(self, state):
+        anchor = (state >> (_ANCHOR_BITS * self._goal_piece)) & _ANCHOR_MASK
+        return anchor in self._goal_anchors
+
+    def neighbours(self, state):
+        """Yield (action, next state) for every single-cell move of a piece."""
+        anchors = self.anchors(state)
+        occupied = self.walls
+        for index, anchor in enumerate(anchors):
+            occupied |= self._cells[index][anchor]
+        for index, anchor in enumerate(anchors):
+            orientation = self.orientations[index]
+            cell = self._enter_backward[index][anchor]
+            if cell is not None and not occupied & cell:
+                yield [index, _BACKWARD[orientation]], state - (
+                    1 << (_ANCHOR_BITS * index)
+                )
+            cell = self._enter_forward[index][anchor]
+            if cell is not None and not occupied & cell:
+                yield [index, _FORWARD[orientation]], state + (
+                    1 << (_ANCHOR_BITS * index)
+                )
+
+    def slides(self, state):
+        """Yield every state reached by sliding one piece by any number of cells.
+
+        A slide is one move in rush.txt, which counts moves instead of the
+        single-cell steps of RushHourEnv.
+        """
+        anchors = self.anchors(state)
+        occupied = self.walls
+        for index, anchor in enumerate(anchors):
+            occupied |= self._cells[index][anchor]
+        for index, anchor in enumerate(anchors):
+            unit = 1 << (_ANCHOR_BITS * index)
+            for enter, step in [(self._enter_backward, -1), (self._enter_forward, 1)]:
+                position, next_state = anchor, state
+                cell = enter[index][position]
+                while cell is not None and not occupied & cell:
+                    position += step
+                    next_state += step * unit
+                    yield next_state
+                    cell = enter[index][position]
+
+    def board(self, state):
+        """Return the 36-character board description of a packed state."""
+        cells = ["o"] * 36
+        for i in range(36):
+            if self.walls >> i & 1:
+                cells[i] = "x"
+        for index, anchor in enumerate(self.anchors(state)):
+            piece_cells = self._cells[index][anchor]
+            for i in range(36):
+                if piece_cells >> i & 1:
+                    cells[i] = self.pieces[index]
+        return "".join(cells)
+
+    def solve(self):
+        """Find a shortest solution with breadth-first search.
+
+        Returns:
+        --------
+        tuple
+            (length, actions) where actions is a list of [piece_index, direction]
+            pairs that RushHourEnv.step accepts and length is the number of steps.
+
+        Raises:
+        -------
+        ValueError
+            If the board cannot be solved.
+        """
+        parents = {self.start: None}
+        queue = deque([self.start])
+        while queue:
+            state = queue.popleft()
+            if self.is_solved(state):
+                actions = []
+                while parents[state] is not None:
+                    state, action = parents[state]
+                    actions.append(action)
+                actions.reverse()
+                return len(actions), actions
+            for action, next_state in self.neighbours(state):
+                if next_state not in parents:
+                    parents[next_state] = (state, action)
+                    queue.append(next_state)
+        raise ValueError("Board is not solvable.")
+
+
+def solve(board_description):
+    """Return (length, actions) of a shortest solution, see RushHourSolver.solve."""
+    return RushHourSolver(board_description).solve()
+
+
+def optimal_solution_length(board_description):
+    """Return the minimum number of RushHourEnv steps needed to solve a board."""
+    return solve(board_description)[0]
@@ -0,0 +1,145 @@
+import numpy as np
+from PIL import Image
+
+# Observation types of the tile based environments. "rgb" and "grayscale" are
+# images, "index" is the board of tile indices and "one_hot" its one-hot encoding.
+OBS_TYPES = ["rgb", "grayscale", "index", "one_hot"]
+
+
+def make_tiles(image: Image.Image, size: int, grayscale: bool = False):
+    """Cut a square image into size x size tiles with the grid lines baked in.
+
+    Args:
+        image (PIL.Image): The image to cut, its width must be a multiple of size.
+        size (int): Number of tiles per row and column.
+        grayscale (bool): If True, the tiles have a single luminance channel.
+            Defaults to False.
+
+    Returns:
+        np.ndarray: uint8 array of shape (size*size, tile_size, tile_size, channels),
+            tile k being the k-th cell in row-major order. The first row and column of
+            every tile are black, which is what outlining each cell looks like.
+    """
+    image = image.convert("L" if grayscale else "RGB")
+    pixels = np.array(image).reshape(image.height, image.width, -1)
+    tile_size = image.width // size
+    tiles = pixels.reshape(size, tile_size, size, tile_size, -1).transpose(
+        0, 2, 1, 3, 4
+    )
+    tiles = np.ascontiguousarray(tiles).reshape(size * size, tile_size, tile_size, -1)
+    tiles[:, 0, :] = 0
+    tiles[:, :, 0] = 0
+    return tiles
+
+
+def board_observation(board, obs_type, num_classes, channels_first=False):
+    """Encode a board of class indices as an "index" or "one_hot" observation.
+
+    Args:
+        board (np.ndarray): (rows, cols) array of class indices.
+        obs_type (str): "index" for the indices as integers, "one_hot" for a
+            (rows, cols, num_classes) array of zeros and ones.
+        num_classes (int): Number of distinct classes.
+        channels_first (bool): If True, one-hot observations are (num_classes, rows, cols).
+            Defaults to False.
+    """
+    if obs_type == "index":
+        return board.astype(index_dtype(num_classes))
+    one_hot = (board[..., None] == np.arange(num_classes)).astype(np.uint8)
+    return np.moveaxis(one_hot, -1, 0) if channels_first else one_hot
+
+
+def check_observation_buffer(buffer, observation_space):
+    """Check that buffer can hold the observations of an environment.
+
+    Raises:
+        ValueError: If the observations are not arrays or buffer is not a writable
+            NumPy array with their shape and dtype.
+    """
+    shape = getattr(observation_space, "shape", None)
+    if not shape:
+        raise ValueError("Only array observations can be written to a buffer.")
+    if (
+        not isinstance(buffer, np.ndarray)
+        or buffer.shape != shape
+        or buffer.dtype != observation_space.dtype
+        or not buffer.flags.writeable
+    ):
+        raise ValueError(
+            f"The observation buffer must be a writable {observation_space.dtype} "
+            f"array of shape {shape}."
+        )
+    return buffer
+
+
+def index_dtype(num_classes):
+    return np.uint8 if num_classes <= 256 else np.uint16
+
+
+def observation_shape(obs_type, rows, cols, cell_size, num_classes, channels_first):
+    """Return the observation shape for a grid of rows x cols cells."""
+    if obs_type == "index":
+        return (rows, cols)
+    if obs_type == "one_hot":
+        channels, height, width = num_classes, rows, cols
+    else:
+        channels = 1 if obs_type == "grayscale" else 3
+        height, width = rows * cell_size, cols * cell_size
+    return (channels, height, width) if channels_first else (height, width, channels)
+
+
+class TileCanvas:
+    def __init__(
+        self, rows: int, cols: int, cell_size: int, channels: int, channels_first=False
+    ):
+        """A frame buffer made of rows x cols square cells, painted cell by cell.
+
+        Args:
+            rows (int): Number of cell rows.
+            cols (int): Number of cell columns.
+            cell_size (int): Width and height of a cell in pixels.
+            channels (int): Number of color channels (3 for RGB, 1 for grayscale).
+            channels_first (bool): If True, the frame is laid out as (channels, height, width),
+                otherwise as (height, width, channels). Defaults to False.
+
+        Attributes:
+            frame (np.ndarray): The uint8 frame buffer.
+        """
+        self.rows = rows
+        self.cols = cols
+        self.cell_size = cell_size
+        self.channels_first = channels_first
+        shape = (rows * cell_size, cols * cell_size, channels)
+        if channels_first:
+            shape = (channels, rows * cell_size, cols * cell_size)
+        self.frame = np.zeros(shape, dtype=np.uint8)
+
+    def set_frame(self, frame):
+        """Paint into frame from now on, e.g. a slice of a shared array, starting from the current picture."""
+        frame[...] = self.frame
+        self.frame = frame
+
+    def layout(self, tiles):
+        """Convert (..., cell_size, cell_size, channels) tiles to the frame layout."""
+        if self.channels_first:
+            return np.ascontiguousarray(np.moveaxis(tiles, -1, -3))
+        return tiles
+
+    def paint(self, pos, tile):
+        """Paint a tile, already in the frame layout, into the cell at pos."""
+        i, j = pos
+        cs = self.cell_size
+        if self.channels_first:
+            self.frame[:, i * cs : (i + 1) * cs, j * cs : (j + 1) * cs] = tile
+        else:
+            self.frame[i * cs : (i + 1) * cs, j * cs : (j + 1) * cs] = tile
+
+    def paint_board(self, tiles, board):
+        """Paint every cell, cell (i, j) showing tiles[board[i, j]] (tiles in the frame layout)."""
+        cs = self.cell_size
+        if self.channels_first:
+            frame = self.frame.reshape(-1, self.rows, cs, self.cols, cs)
+            frame[:] = tiles[board].transpose(2, 0, 3, 1, 4)
+        else:
+            frame = self.frame.reshape(self.rows, cs, self.cols, cs, -1)
+            frame[:] = tiles[board].transpose(0, 2, 1, 3, 4)
@@ -0,0 +1,111 @@
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+
+class PhaseTimer:
+    def __init__(
+        self,
+        callback: Optional[Callable[[str, float], None]] = None,
+        max_samples: int = 100000,
+    ):
+        """Aggregate the durations of named phases, e.g. the parts of an environment step.
+
+        Args:
+            callback (Callable, optional): Called as callback(phase, seconds) after every
+                timed call, e.g. to forward the timings to a dashboard. Defaults to None.
+            max_samples (int): Number of most recent durations kept per phase for the
+                percentiles. Counts and totals cover every call. Defaults to 100000.
+        """
+        self.callback = callback
+        self.max_samples = max_samples
+        self.clear()
+
+    def clear(self):
+        self._counts = {}
+        self._totals = {}
+        self._samples = {}
+
+    def record(self, phase: str, seconds: float):
+        if phase not in self._counts:
+            self._counts[phase] = 0
+            self._totals[phase] = 0.0
+            self._samples[phase] = deque(maxlen=self.max_samples)
+        self._counts[phase] += 1
+        self._totals[phase] += seconds
+        self._samples[phase].append(seconds)
+        if self.callback is not None:
+            self.callback(phase, seconds)
+
+    def stats(self):
+        """Return the timings of every phase.
+
+        Returns:
+            dict: For every phase, a dict with "count", "total_seconds", "mean_seconds",
+                "p50_seconds", "p90_seconds", "p99_seconds" and "max_seconds".
+        """
+        stats = {}
+        for phase, count in self._counts.items():
+            samples = np.array(self._samples[phase])
+            p50, p90, p99 = np.percentile(samples, [50, 90, 99])
+            stats[phase] = {
+                "count": count,
+                "total_seconds": self._totals[phase],
+                "mean_seconds": self._totals[phase] / count,
+                "p50_seconds": float(p50),
+                "p90_seconds": float(p90),
+                "p99_seconds": float(p99),
+                "max_seconds": float(samples.max()),
+            }
+        return stats
+
+
+def _timed(function, phase, timer):
+    perf_counter = time.perf_counter
+    record = timer.record
+
+    def timed_function(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record(phase, perf_counter() - start)
+
+    return timed_function
+
+
+def enable_timing(env, phases: Dict[str, str], timer: PhaseTimer):
+    """Time the phase methods of one environment instance.
+
+    The methods are replaced by timed wrappers on the instance only, so the
+    environment class is untouched and an environment without timing runs
+    exactly the same code as before.
+
+    The wrappers are closures and cannot be pickled, so environments drop them
+    in __getstate__ (see without_timing) and install them again on unpickling.
+
+    Args:
+        env: The environment.
+        phases (dict): Phase names mapped to the names of the methods they time.
+            Phases can be nested, e.g. a move that redraws cells.
+        timer (PhaseTimer): Receives the durations.
+    """
+    disable_timing(env, phases)
+    for phase, name in phases.items():
+        setattr(env, name, _timed(getattr(env, name), phase, timer))
+
+
+def disable_timing(env, phases: Dict[str, str]):
+    """Remove the timed wrappers installed by enable_timing."""
+    for name in phases.values():
+        env.__dict__.pop(name, None)
+
+
+def without_timing(state: dict, phases: Dict[str, str]):
+    """Return a copy of an environment's __dict__ without the timed wrappers."""
+    state = dict(state)
+    for name in phases.values():
+        state.pop(name, None)
+    return state